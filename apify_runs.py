@@ -0,0 +1,219 @@
+"""
+Apify actor runs for Instagram scraping
+Each batch of URLs becomes its own actor run; several runs are started at once and
+their datasets are collected as each run finishes, instead of one run after another.
+In the web server, runs report completion through a webhook so waiting jobs sit idle
+instead of holding a long-poll open; a slow status poll covers lost webhooks
+"""
+import asyncio
+import os
+import sys
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from apify_client import ApifyClientAsync
+
+# Actor runs in flight at once (Apify also caps concurrent runs per account)
+MAX_PARALLEL_RUNS = int(os.getenv("INSTAGRAM_MAX_PARALLEL_RUNS", "3"))
+
+# Apify API base URL (point it at fake_apify.py to test offline)
+API_URL = os.getenv("APIFY_API_URL", "https://api.apify.com")
+
+# Seconds between status checks while waiting for a run's completion webhook
+POLL_INTERVAL = float(os.getenv("APIFY_POLL_INTERVAL", "30"))
+
+# Terminal run statuses and the webhook events that report them
+FINISHED_STATUSES = {"SUCCEEDED", "FAILED", "TIMED-OUT", "ABORTED"}
+RUN_FINISHED_EVENTS = ["ACTOR.RUN.SUCCEEDED", "ACTOR.RUN.FAILED", "ACTOR.RUN.TIMED_OUT", "ACTOR.RUN.ABORTED"]
+
+# Completion webhooks that arrived before their run was being waited for (bounded)
+_MAX_EARLY_NOTIFICATIONS = 1000
+
+# Set by the web server; None means wait by polling Apify
+_webhook_url: Optional[str] = None
+# Run id -> future resolved by the completion webhook
+_waiters: Dict[str, asyncio.Future] = {}
+_early: "OrderedDict[str, bool]" = OrderedDict()
+_stats = {"webhooks": 0, "polls": 0}
+
+
+def _log(msg: str) -> None:
+    print(msg, file=sys.stderr, flush=True)
+
+
+def run_value(run: Any, key: str, attr: str) -> Any:
+    """
+    Read a field of a run object.
+
+    apify-client 1.x/2.x return plain dicts (camelCase keys); 3.x returns models with
+    snake_case attributes.
+    """
+    if run is None:
+        return None
+    if isinstance(run, dict):
+        return run.get(key)
+    value = getattr(run, attr, None)
+    return getattr(value, "value", value)  # Enum statuses
+
+
+def make_client(token: str) -> ApifyClientAsync:
+    return ApifyClientAsync(token, api_url=API_URL)
+
+
+def enable_webhooks(url: Optional[str]) -> None:
+    """Attach a completion webhook calling url to every run started from now on (None turns it off)."""
+    global _webhook_url
+    _webhook_url = url or None
+
+
+def notify_run_finished(run_id: str) -> bool:
+    """
+    Wake the job waiting for a run (call on the event loop when its webhook arrives).
+
+    Returns:
+        True if a job was waiting for the run
+    """
+    _stats["webhooks"] += 1
+    waiter = _waiters.get(run_id)
+    if waiter is None:
+        # The webhook can beat start() returning the run id to its waiter
+        _early[run_id] = True
+        while len(_early) > _MAX_EARLY_NOTIFICATIONS:
+            _early.popitem(last=False)
+        return False
+    if not waiter.done():
+        waiter.set_result(True)
+    return True
+
+
+def status() -> Dict[str, Any]:
+    return {"webhooks_enabled": _webhook_url is not None, "waiting_runs": len(_waiters), **_stats}
+
+
+async def _wait_for_run(client: ApifyClientAsync, run_id: str) -> Any:
+    """Wait until a run has finished and return it."""
+    if _webhook_url is None:
+        return await client.run(run_id).wait_for_finish()
+
+    waiter = asyncio.get_running_loop().create_future()
+    _waiters[run_id] = waiter
+    if _early.pop(run_id, None):
+        waiter.set_result(True)
+    try:
+        while True:
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter), POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                _stats["polls"] += 1  # No webhook yet: check in case it was lost
+            run = await client.run(run_id).get()
+            if run is None or run_value(run, "status", "status") in FINISHED_STATUSES:
+                return run
+            if waiter.done():
+                # Webhook arrived but the run doesn't show as finished yet; keep polling
+                waiter = asyncio.get_running_loop().create_future()
+                _waiters[run_id] = waiter
+    finally:
+        _waiters.pop(run_id, None)
+
+
+async def start_run(client: ApifyClientAsync, actor_id: str, run_input: Dict[str, Any],
+                    started: Dict[str, bool]) -> Any:
+    """
+    Start an actor run without waiting for it.
+
+    Args:
+        client: Async Apify client
+        actor_id: Actor to run
+        run_input: Actor input
+        started: Run id -> finished flag, shared so unfinished runs can be aborted
+
+    Returns:
+        The run as returned by the start call
+    """
+    webhooks = None
+    if _webhook_url is not None:
+        webhooks = [{"event_types": RUN_FINISHED_EVENTS, "request_url": _webhook_url}]
+    run = await client.actor(actor_id).start(run_input=run_input, webhooks=webhooks)
+    started[run_value(run, "id", "id")] = False
+    return run
+
+
+async def finish_run(client: ApifyClientAsync, run: Any, started: Dict[str, bool],
+                     fields: Optional[List[str]] = None,
+                     transform: Optional[Callable[[dict], Optional[dict]]] = None) -> List[dict]:
+    """
+    Wait for a started run and collect its dataset (also when the run failed part-way,
+    which is logged).
+
+    Items are streamed page by page; with transform, each raw item is converted as it
+    arrives and only the (non-None) results are kept.
+
+    Args:
+        client: Async Apify client
+        run: Run returned by start_run
+        started: Run id -> finished flag
+        fields: Only download these item fields (default: all)
+        transform: Converts a raw item into the record to keep, or None to drop it
+
+    Returns:
+        Records (or raw items without transform)
+    """
+    run_id = run_value(run, "id", "id")
+    finished = await _wait_for_run(client, run_id)
+    started[run_id] = True
+    status = run_value(finished, "status", "status")
+    if status != "SUCCEEDED":
+        _log(f"Apify run {run_id} finished with status {status}; keeping any results it produced")
+    dataset_id = run_value(finished or run, "defaultDatasetId", "default_dataset_id")
+    records = []
+    async for item in client.dataset(dataset_id).iterate_items(fields=fields):
+        record = transform(item) if transform else item
+        if record is not None:
+            records.append(record)
+    return records
+
+
+async def run_batches(client: ApifyClientAsync, actor_id: str, inputs: List[Dict[str, Any]],
+                      max_parallel: int = 0, start_delay: float = 0.0,
+                      fields: Optional[List[str]] = None,
+                      transform: Optional[Callable[[dict], Optional[dict]]] = None
+                      ) -> AsyncIterator[Tuple[int, Optional[List[dict]], Optional[BaseException]]]:
+    """
+    Run the actor once per input, at most max_parallel runs at a time.
+
+    Run starts are spaced start_delay seconds apart. Datasets are read with fields and
+    transform as in finish_run. Results are yielded in completion order; a failed batch yields its exception instead of items so the others carry on.
+    If the caller stops early (e.g. a stage deadline), runs still in progress are aborted.
+
+    Yields:
+        (input index, records or None, exception or None)
+    """
+    semaphore = asyncio.Semaphore(max(1, max_parallel or MAX_PARALLEL_RUNS))
+    start_lock = asyncio.Lock()
+    started: Dict[str, bool] = {}
+
+    async def _one(index: int, run_input: Dict[str, Any]):
+        async with semaphore:
+            try:
+                async with start_lock:
+                    run = await start_run(client, actor_id, run_input, started)
+                    # Hold the start slot briefly so run starts don't arrive in one burst
+                    if start_delay > 0 and index < len(inputs) - 1:
+                        await asyncio.sleep(start_delay)
+                return index, await finish_run(client, run, started, fields, transform), None
+            except Exception as e:
+                return index, None, e
+
+    tasks = [asyncio.ensure_future(_one(i, run_input)) for i, run_input in enumerate(inputs)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        unfinished = [run_id for run_id, done in started.items() if not done]
+        if unfinished:
+            _log(f"Aborting {len(unfinished)} unfinished Apify run(s)...")
+            await asyncio.gather(*(client.run(run_id).abort() for run_id in unfinished),
+                                 return_exceptions=True)
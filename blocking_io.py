@@ -0,0 +1,71 @@
+"""
+Bounded executor for blocking I/O
+gspread, the Apify SDK and SQLite are synchronous; running them on the event loop stalls
+every other request the web server is handling. They run on this pool instead, which is
+sized separately from asyncio's default executor so a large refresh can't take every thread
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+# Threads available for blocking calls across all running jobs
+BLOCKING_IO_WORKERS = int(os.getenv("BLOCKING_IO_WORKERS", "8"))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_in_flight = 0
+_counter_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max(1, BLOCKING_IO_WORKERS),
+                                           thread_name_prefix="blocking-io")
+        return _executor
+
+
+async def run_blocking(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Run a blocking callable on the I/O pool and await its result.
+
+    Like asyncio.to_thread, the caller's context variables (e.g. the job reporting
+    progress) are visible inside fn.
+
+    Args:
+        fn: Blocking function to call
+        *args, **kwargs: Passed through to fn
+
+    Returns:
+        Whatever fn returns (its exceptions are raised here)
+    """
+    global _in_flight
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, fn, *args, **kwargs)
+    with _counter_lock:
+        _in_flight += 1
+    try:
+        return await loop.run_in_executor(_get_executor(), call)
+    finally:
+        with _counter_lock:
+            _in_flight -= 1
+
+
+def status() -> Dict[str, int]:
+    """Pool size and calls currently running or waiting for a thread."""
+    return {"workers": max(1, BLOCKING_IO_WORKERS), "in_flight": _in_flight}
+
+
+def shutdown() -> None:
+    """Stop the pool (it is recreated on the next call)."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -59,6 +59,9 @@ def cmd_update_sheets(_args: argparse.Namespace) -> int:
                 override=_args.override,
                 start_row=start_row,
                 end_row=end_row,
+                use_cache=not _args.no_cache,
+                chunk_rows=_args.chunk_rows,
+                resume=_args.resume,
             )
         )
         return 0
@@ -122,6 +125,24 @@ Environment Variables:
         help="Row range to process in format 'start:end' (e.g., '2:10' to process rows 2-10). Row 1 is the header.",
         default="",
     )
+    p_upd.add_argument(
+        "--no-cache",
+        help="Ignore cached stats and refetch every URL (results are still stored for later runs).",
+        action="store_true",
+    )
+    p_upd.add_argument(
+        "--chunk-rows",
+        help="Process the sheet this many rows at a time, writing each chunk as soon as it is done "
+             "(default: SHEETS_CHUNK_ROWS, or the whole range at once). Useful for very large sheets.",
+        type=int,
+        default=None,
+    )
+    p_upd.add_argument(
+        "--resume",
+        help="Continue an interrupted run over the same sheet and row range, reusing the results "
+             "it already fetched instead of fetching them again.",
+        action="store_true",
+    )
     p_upd.set_defaults(func=cmd_update_sheets)
 
     p_set = sub.add_parser("set-defaults", help="Save default Sheet URL/ID and worksheet for future runs")
@@ -0,0 +1,185 @@
+"""
+Fake Apify API for offline testing of Instagram fetching
+Implements the handful of endpoints the app uses (start actor run, get/abort run, list
+dataset items) and delivers completion webhooks like Apify does.
+
+Usage:
+    python fake_apify.py --port 8765 --run-seconds 5
+    APIFY_API_URL=http://localhost:8765 APIFY_TOKEN=apify_api_fake \\
+        APIFY_WEBHOOK_URL=http://localhost:8000/api/apify/webhook python web_app.py
+
+Pass --drop-webhooks to exercise the polling fallback.
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import sys
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+app = FastAPI(title="Fake Apify API")
+
+RUN_SECONDS = 5.0
+DROP_WEBHOOKS = False
+
+# run id -> run dict; dataset id -> items
+_runs: Dict[str, Dict[str, Any]] = {}
+_datasets: Dict[str, List[Dict[str, Any]]] = {}
+_finish_tasks: Dict[str, asyncio.Task] = {}
+
+_STATUS_EVENTS = {"SUCCEEDED": "ACTOR.RUN.SUCCEEDED", "FAILED": "ACTOR.RUN.FAILED",
+                  "TIMED-OUT": "ACTOR.RUN.TIMED_OUT", "ABORTED": "ACTOR.RUN.ABORTED"}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _fake_item(url: str) -> Dict[str, Any]:
+    """Deterministic post data for a URL, padded like a real scraper item."""
+    seed = int(hashlib.sha1(url.encode("utf-8")).hexdigest()[:8], 16)
+    return {
+        "inputUrl": url,
+        "url": url,
+        "type": "Video",
+        "shortCode": url.rstrip("/").rsplit("/", 1)[-1],
+        "videoPlayCount": 1000 + seed % 100000,
+        "likesCount": 10 + seed % 5000,
+        "commentsCount": seed % 300,
+        "ownerUsername": f"fake_user_{seed % 97}",
+        "timestamp": "2024-05-01T12:00:00.000Z",
+        "caption": "lorem ipsum " * 40,
+        "latestComments": [{"text": "nice", "ownerUsername": "someone"}] * 20,
+        "images": [f"https://example.com/{seed}/{i}.jpg" for i in range(5)],
+    }
+
+
+def _run_dict(run_id: str, actor_id: str, dataset_id: str) -> Dict[str, Any]:
+    return {
+        "id": run_id,
+        "actId": actor_id,
+        "userId": "fake-user",
+        "startedAt": _now(),
+        "finishedAt": None,
+        "status": "RUNNING",
+        "meta": {"origin": "API"},
+        "stats": {},
+        "options": {"build": "latest", "timeoutSecs": 3600, "memoryMbytes": 1024, "diskMbytes": 2048},
+        "buildId": "fake-build",
+        "defaultKeyValueStoreId": f"kvs-{run_id}",
+        "defaultDatasetId": dataset_id,
+        "defaultRequestQueueId": f"rq-{run_id}",
+    }
+
+
+async def _deliver_webhooks(run: Dict[str, Any], webhooks: List[Dict[str, Any]]) -> None:
+    event_type = _STATUS_EVENTS.get(run["status"], "")
+    for webhook in webhooks:
+        if event_type not in (webhook.get("eventTypes") or []):
+            continue
+        if DROP_WEBHOOKS:
+            print(f"Dropping {event_type} webhook for run {run['id']}", file=sys.stderr)
+            continue
+        payload = {
+            "userId": run["userId"],
+            "createdAt": _now(),
+            "eventType": event_type,
+            "eventData": {"actorId": run["actId"], "actorRunId": run["id"]},
+            "resource": run,
+        }
+        try:
+            async with httpx.AsyncClient(timeout=10) as client:
+                response = await client.post(webhook["requestUrl"], json=payload)
+            print(f"Webhook {event_type} for run {run['id']}: HTTP {response.status_code}", file=sys.stderr)
+        except httpx.HTTPError as e:
+            print(f"Webhook for run {run['id']} failed: {e}", file=sys.stderr)
+
+
+async def _finish_later(run_id: str, webhooks: List[Dict[str, Any]]) -> None:
+    await asyncio.sleep(RUN_SECONDS)
+    run = _runs[run_id]
+    if run["status"] == "RUNNING":
+        run["status"] = "SUCCEEDED"
+        run["finishedAt"] = _now()
+    await _deliver_webhooks(run, webhooks)
+
+
+@app.post("/v2/acts/{actor_id}/runs")
+@app.post("/v2/actors/{actor_id}/runs")
+async def start_run(actor_id: str, request: Request, webhooks: str = ""):
+    try:
+        run_input = await request.json()
+    except ValueError:
+        run_input = {}
+    run_id = uuid.uuid4().hex[:17]
+    dataset_id = f"ds-{run_id}"
+    _datasets[dataset_id] = [_fake_item(url) for url in (run_input or {}).get("directUrls", [])]
+    _runs[run_id] = _run_dict(run_id, actor_id.replace("~", "/"), dataset_id)
+    hooks = json.loads(base64.b64decode(webhooks)) if webhooks else []
+    _finish_tasks[run_id] = asyncio.create_task(_finish_later(run_id, hooks))
+    return JSONResponse(status_code=201, content={"data": _runs[run_id]})
+
+
+@app.get("/v2/actor-runs/{run_id}")
+async def get_run(run_id: str, waitForFinish: int = 0):
+    if run_id not in _runs:
+        raise HTTPException(status_code=404, detail="Run not found")
+    deadline = asyncio.get_running_loop().time() + min(max(waitForFinish, 0), 60)
+    while _runs[run_id]["status"] == "RUNNING" and asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(0.2)
+    return {"data": _runs[run_id]}
+
+
+@app.post("/v2/actor-runs/{run_id}/abort")
+async def abort_run(run_id: str):
+    run = _runs.get(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    if run["status"] == "RUNNING":
+        run["status"] = "ABORTED"
+        run["finishedAt"] = _now()
+    return {"data": run}
+
+
+@app.get("/v2/datasets/{dataset_id}/items")
+async def list_items(dataset_id: str, offset: int = 0, limit: int = 1000, fields: str = ""):
+    items = _datasets.get(dataset_id)
+    if items is None:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    page = items[offset:offset + limit]
+    if fields:
+        wanted = set(fields.split(","))
+        page = [{k: v for k, v in item.items() if k in wanted} for item in page]
+    headers = {
+        "X-Apify-Pagination-Total": str(len(items)),
+        "X-Apify-Pagination-Offset": str(offset),
+        "X-Apify-Pagination-Count": str(len(page)),
+        "X-Apify-Pagination-Limit": str(limit),
+        "X-Apify-Pagination-Desc": "false",
+    }
+    return JSONResponse(content=page, headers=headers)
+
+
+def main():
+    global RUN_SECONDS, DROP_WEBHOOKS
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--run-seconds", type=float, default=RUN_SECONDS, help="How long each actor run takes")
+    parser.add_argument("--drop-webhooks", action="store_true", help="Never deliver completion webhooks")
+    args = parser.parse_args()
+    RUN_SECONDS = args.run_seconds
+    DROP_WEBHOOKS = args.drop_webhooks
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
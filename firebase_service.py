@@ -3,11 +3,37 @@ Firebase service layer for user authentication and data storage
 """
 import os
 import json
+import asyncio
 import base64
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from typing import Optional, Dict, Any, Tuple
 from firebase_admin import auth, firestore, storage
 from datetime import datetime
 import firebase_config
+import blocking_io
+
+# Decoded ID tokens kept in memory until they expire (0 disables the cache)
+TOKEN_CACHE_SIZE = int(os.getenv("FIREBASE_TOKEN_CACHE_SIZE", "10000"))
+
+# Cached tokens are treated as expired this many seconds before their exp claim
+TOKEN_EXPIRY_LEEWAY = float(os.getenv("FIREBASE_TOKEN_EXPIRY_LEEWAY", "30"))
+
+# sha256(token) -> (expires at, decoded token); most recently used last
+_token_cache: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+_token_cache_lock = threading.Lock()
+_token_stats = {"hits": 0, "misses": 0}
+
+# Seconds user preferences are served from memory before Firestore is read again (0 = always read)
+PREFERENCES_CACHE_TTL = float(os.getenv("FIREBASE_PREFERENCES_CACHE_TTL", "300"))
+
+# Storage deletes sent per batch request (the API accepts at most 100)
+STORAGE_DELETE_BATCH = 100
+
+# user_id -> (expires at, preferences)
+_preferences_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
 
 def create_user(email: str, password: str, username: str) -> Tuple[bool, str, Optional[Dict]]:
     """
@@ -106,6 +132,47 @@ def verify_id_token(id_token: str) -> Optional[Dict]:
         print(f"Error verifying ID token: {e}")
         return None
 
+async def verify_id_token_cached(id_token: str) -> Optional[Dict]:
+    """
+    Verify a Firebase ID token, reusing earlier verifications of the same token.
+
+    Tokens are cached by hash until shortly before their exp claim; a cold verification
+    (signature check, and a key fetch when Google rotates its keys) runs on the blocking
+    I/O pool. Failed verifications are not cached.
+
+    Returns:
+        Decoded token or None if it is invalid
+    """
+    if not id_token:
+        return None
+    key = hashlib.sha256(id_token.encode("utf-8")).hexdigest()
+    now = time.time()
+    with _token_cache_lock:
+        cached = _token_cache.get(key)
+        if cached is not None:
+            if cached[0] > now:
+                _token_cache.move_to_end(key)
+                _token_stats["hits"] += 1
+                return cached[1]
+            del _token_cache[key]
+        _token_stats["misses"] += 1
+
+    decoded = await blocking_io.run_blocking(verify_id_token, id_token)
+    if decoded and TOKEN_CACHE_SIZE > 0:
+        expires_at = float(decoded.get("exp", 0)) - TOKEN_EXPIRY_LEEWAY
+        if expires_at > now:
+            with _token_cache_lock:
+                _token_cache[key] = (expires_at, decoded)
+                _token_cache.move_to_end(key)
+                while len(_token_cache) > TOKEN_CACHE_SIZE:
+                    _token_cache.popitem(last=False)
+    return decoded
+
+def token_cache_stats() -> Dict[str, int]:
+    """Hit/miss counters and current size of the ID token cache."""
+    with _token_cache_lock:
+        return {**_token_stats, "size": len(_token_cache)}
+
 def store_credentials(user_id: str, credentials_data: bytes, filename: str = "credentials.json") -> Tuple[bool, str]:
     """
     Store user's Google OAuth credentials in Firebase Storage
@@ -164,10 +231,10 @@ async def get_credentials(user_id: str, filename: str = "credentials.json") -> O
         
         blob = bucket.blob(f"credentials/{user_id}/{filename}")
         
-        if not blob.exists():
+        if not await blocking_io.run_blocking(blob.exists):
             return None
         
-        data = blob.download_as_bytes()
+        data = await blocking_io.run_blocking(blob.download_as_bytes)
         return data.decode('utf-8')
         
     except Exception as e:
@@ -211,7 +278,7 @@ async def store_oauth_token(user_id: str, token_data: Dict) -> Tuple[bool, str]:
             return False, "Firestore not initialized"
         
         cred_ref = db.collection('user_credentials').document(user_id)
-        cred_ref.set({
+        await blocking_io.run_blocking(cred_ref.set, {
             'oauth_token': token_data,
             'oauth_updated_at': datetime.utcnow()
         }, merge=True)
@@ -229,7 +296,7 @@ async def get_oauth_token(user_id: str) -> Optional[Dict]:
             return None
         
         cred_ref = db.collection('user_credentials').document(user_id)
-        cred_doc = cred_ref.get()
+        cred_doc = await blocking_io.run_blocking(cred_ref.get)
         
         if cred_doc.exists:
             data = cred_doc.to_dict()
@@ -241,7 +308,7 @@ async def get_oauth_token(user_id: str) -> Optional[Dict]:
         print(f"Error retrieving OAuth token: {e}")
         return None
 
-def save_user_preferences(user_id: str, preferences: Dict[str, Any]) -> Tuple[bool, str]:
+async def save_user_preferences(user_id: str, preferences: Dict[str, Any]) -> Tuple[bool, str]:
     """
     Save user preferences (default spreadsheet, worksheet, etc.)
     
@@ -259,51 +326,70 @@ def save_user_preferences(user_id: str, preferences: Dict[str, Any]) -> Tuple[bo
         
         user_ref = db.collection('users').document(user_id)
         preferences['updated_at'] = datetime.utcnow()
-        user_ref.set({'preferences': preferences}, merge=True)
+        await blocking_io.run_blocking(user_ref.set, {'preferences': preferences}, merge=True)
+        # merge=True merges nested fields, so the stored map may hold more than was sent
+        _preferences_cache.pop(user_id, None)
         
         return True, "Preferences saved successfully"
         
     except Exception as e:
         return False, f"Error saving preferences: {str(e)}"
 
-def get_user_preferences(user_id: str) -> Optional[Dict[str, Any]]:
-    """Retrieve user preferences"""
+async def get_user_preferences(user_id: str) -> Optional[Dict[str, Any]]:
+    """Retrieve user preferences (read through a short-lived in-memory cache)"""
     try:
+        cached = _preferences_cache.get(user_id)
+        if cached is not None and cached[0] > time.time():
+            return dict(cached[1])
+        
         db = firebase_config.get_firestore()
         if not db:
             return None
         
         user_ref = db.collection('users').document(user_id)
-        user_doc = user_ref.get()
+        user_doc = await blocking_io.run_blocking(user_ref.get)
         
-        if user_doc.exists:
-            data = user_doc.to_dict()
-            return data.get('preferences', {})
-        
-        return {}
+        preferences = user_doc.to_dict().get('preferences', {}) if user_doc.exists else {}
+        if PREFERENCES_CACHE_TTL > 0:
+            _preferences_cache[user_id] = (time.time() + PREFERENCES_CACHE_TTL, preferences)
+        return dict(preferences)
         
     except Exception as e:
         print(f"Error retrieving preferences: {e}")
         return None
 
-def delete_user_data(user_id: str) -> Tuple[bool, str]:
+def _delete_firestore_docs(db, user_id: str) -> None:
+    """Delete the user's Firestore documents in one batched commit."""
+    batch = db.batch()
+    batch.delete(db.collection('users').document(user_id))
+    batch.delete(db.collection('user_credentials').document(user_id))
+    batch.commit()
+
+def _delete_storage_blobs(bucket, user_id: str) -> None:
+    """Delete the user's stored files, up to STORAGE_DELETE_BATCH per batch request."""
+    blobs = list(bucket.list_blobs(prefix=f"credentials/{user_id}/"))
+    for i in range(0, len(blobs), STORAGE_DELETE_BATCH):
+        with bucket.client.batch():
+            for blob in blobs[i:i + STORAGE_DELETE_BATCH]:
+                blob.delete()
+
+async def delete_user_data(user_id: str) -> Tuple[bool, str]:
     """Delete all user data (for account deletion)"""
     try:
-        # Delete from Firestore
         db = firebase_config.get_firestore()
-        if db:
-            db.collection('users').document(user_id).delete()
-            db.collection('user_credentials').document(user_id).delete()
-        
-        # Delete from Storage
         bucket = firebase_config.get_storage()
+        
+        # Firestore and Storage deletes run concurrently
+        cleanup = []
+        if db:
+            cleanup.append(blocking_io.run_blocking(_delete_firestore_docs, db, user_id))
         if bucket:
-            blobs = bucket.list_blobs(prefix=f"credentials/{user_id}/")
-            for blob in blobs:
-                blob.delete()
+            cleanup.append(blocking_io.run_blocking(_delete_storage_blobs, bucket, user_id))
+        await asyncio.gather(*cleanup)
+        _preferences_cache.pop(user_id, None)
         
         # Delete from Auth
-        auth.delete_user(user_id)
+        await blocking_io.run_blocking(auth.delete_user, user_id)
         
         return True, "User data deleted successfully"
         
@@ -174,6 +174,39 @@ def extract_impressions(item: dict):
     return plays, likes, comments, post_date
 
 
+# Dataset fields read by extract_impressions/extract_username/stats_record. Everything else
+# the scraper returns (captions, images, latestComments, ...) is never downloaded.
+DATASET_FIELDS = [
+    "inputUrl", "url", "type", "childPosts",
+    "videoPlayCount", "videoViewCount", "playCount", "video_view_count",
+    "likesCount", "edge_liked_by", "like_count", "previewLikeCount",
+    "commentsCount", "edge_media_to_comment",
+    "timestamp", "timestampParsed", "taken_at_timestamp",
+    "ownerUsername", "username", "owner_username", "owner", "displayUrl",
+]
+
+
+def stats_record(item: dict):
+    """
+    Reduce a dataset item to the stats the sheet needs.
+    Returns {"url", "views", "likes", "comments", "username", "date"} (stats as strings),
+    or None when the item can't be matched to a post URL.
+    """
+    src = item.get("inputUrl") or item.get("url") or ""
+    cu = canonicalize_instagram_url(src) if src else ""
+    if not cu:
+        return None
+    plays, likes, comments, post_date = extract_impressions(item)
+    return {
+        "url": cu,
+        "views": str(plays) if isinstance(plays, int) else "",
+        "likes": str(likes) if isinstance(likes, int) else "",
+        "comments": str(comments) if isinstance(comments, int) else "",
+        "username": extract_username(item),
+        "date": post_date,
+    }
+
+
 def fmt(n):
     return f"{n:,}" if isinstance(n, int) else "N/A"
 
@@ -0,0 +1,208 @@
+"""
+Direct-HTTP Instagram stats fetcher
+Public posts expose their counts on the post's embed page, so most posts can be read with
+one plain HTTP request instead of a billed, minutes-long Apify actor run. Posts this fails
+for (private, removed, login walls) are left to Apify
+
+Usage (parse a saved embed page, e.g. to check the parser against a new page layout):
+    python ig_http.py saved_embed_page.html https://www.instagram.com/p/SHORTCODE
+"""
+import asyncio
+import json
+import os
+import re
+import sys
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+import ig as igmod
+
+# Try the embed page before Apify (set to 0 to send every post to Apify)
+ENABLED = os.getenv("INSTAGRAM_DIRECT_FETCH", "1") != "0"
+
+# Page requests in flight at once
+HTTP_CONCURRENCY = int(os.getenv("INSTAGRAM_HTTP_CONCURRENCY", "8"))
+
+# Per-request timeout in seconds
+HTTP_TIMEOUT = float(os.getenv("INSTAGRAM_HTTP_TIMEOUT", "10"))
+
+# Stop trying direct fetches for the rest of a run after this many failures in a row
+# (Instagram is serving login walls), sending the remaining posts straight to Apify
+MAX_CONSECUTIVE_FAILURES = int(os.getenv("INSTAGRAM_HTTP_MAX_CONSECUTIVE_FAILURES", "10"))
+
+_SHORTCODE_RE = re.compile(r"/(?:p|reel|reels|tv)/([A-Za-z0-9_-]+)")
+_ADDITIONAL_DATA_RE = re.compile(r"window\.__additionalDataLoaded\(\s*'[^']*'\s*,\s*(\{.*?\})\s*\);", re.DOTALL)
+_CONTEXT_JSON_RE = re.compile(r'"contextJSON"\s*:\s*("(?:[^"\\]|\\.)*")', re.DOTALL)
+
+_HEADERS = {
+    "User-Agent": ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                   "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.5",
+}
+
+
+def _log(msg: str):
+    print(msg, file=sys.stderr, flush=True)
+
+
+def shortcode(url: str) -> str:
+    match = _SHORTCODE_RE.search(url or "")
+    return match.group(1) if match else ""
+
+
+def embed_url(url: str) -> str:
+    return f"https://www.instagram.com/p/{shortcode(url)}/embed/captioned/"
+
+
+def _find_media(data: Any) -> Optional[dict]:
+    """Locate the shortcode_media object wherever the page nests it."""
+    if isinstance(data, dict):
+        media = data.get("shortcode_media")
+        if isinstance(media, dict):
+            return media
+        for value in data.values():
+            media = _find_media(value)
+            if media is not None:
+                return media
+    elif isinstance(data, list):
+        for value in data:
+            media = _find_media(value)
+            if media is not None:
+                return media
+    return None
+
+
+def _embedded_media(html: str) -> Optional[dict]:
+    for match in _ADDITIONAL_DATA_RE.finditer(html):
+        try:
+            media = _find_media(json.loads(match.group(1)))
+        except ValueError:
+            continue
+        if media is not None:
+            return media
+    match = _CONTEXT_JSON_RE.search(html)
+    if match:
+        try:
+            # contextJSON is a JSON document stored as a JSON string
+            return _find_media(json.loads(json.loads(match.group(1))))
+        except (ValueError, TypeError):
+            return None
+    return None
+
+
+def parse_embed_page(html: str, url: str) -> Optional[Dict[str, str]]:
+    """
+    Extract a post's stats from its embed page.
+
+    Args:
+        html: Embed page HTML
+        url: Canonical post URL (becomes the record's key)
+
+    Returns:
+        Stats record in the igmod.stats_record shape, or None when the page carries
+        no usable data (login wall, private or removed post, new layout)
+    """
+    media = _embedded_media(html)
+    if media is None:
+        return None
+    code = shortcode(url)
+    if code and media.get("shortcode") and media["shortcode"] != code:
+        return None
+    if not any(isinstance(media.get(f), dict) for f in ("edge_liked_by", "edge_media_preview_like")):
+        return None
+    if "is_video" not in media and "product_type" not in media:
+        return None  # Can't tell a photo (no views) from a video missing its count
+    # Only the play count is the metric Apify reports as views (video_view_count is a
+    # different, smaller one); videos without it are left to Apify
+    is_video = media.get("is_video") or media.get("product_type") == "clips"
+    if is_video and not isinstance(media.get("video_play_count"), int):
+        return None
+    # Rename into the fields of an Apify dataset item so the record comes out of
+    # igmod.stats_record exactly as it would for an Apify result
+    item = {
+        "inputUrl": url,
+        "videoPlayCount": media.get("video_play_count") if is_video else None,
+        "edge_liked_by": media.get("edge_liked_by") or media.get("edge_media_preview_like"),
+        "edge_media_to_comment": media.get("edge_media_to_comment") or media.get("edge_media_to_parent_comment"),
+        "taken_at_timestamp": media.get("taken_at_timestamp"),
+        "owner": media.get("owner"),
+    }
+    return igmod.stats_record(item)
+
+
+def make_client() -> httpx.AsyncClient:
+    """Pooled client for embed page requests."""
+    return httpx.AsyncClient(
+        headers=_HEADERS,
+        timeout=HTTP_TIMEOUT,
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=HTTP_CONCURRENCY, max_keepalive_connections=HTTP_CONCURRENCY),
+    )
+
+
+async def fetch_record(client: httpx.AsyncClient, url: str) -> Optional[Dict[str, str]]:
+    """Fetch one post's stats record from its embed page (None if that didn't work)."""
+    if not shortcode(url):
+        return None
+    try:
+        response = await client.get(embed_url(url))
+    except httpx.HTTPError:
+        return None
+    if response.status_code != 200:
+        return None
+    return parse_embed_page(response.text, url)
+
+
+async def fetch_many(urls: List[str], on_result: Optional[Callable] = None,
+                     concurrency: int = 0) -> Tuple[Dict[str, Dict[str, str]], List[str]]:
+    """
+    Fetch many posts directly.
+
+    on_result(record) is called for each success. After MAX_CONSECUTIVE_FAILURES misses
+    in a row the remaining posts are not tried.
+
+    Returns:
+        (url -> stats record for successes, URLs left for Apify in input order)
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency or HTTP_CONCURRENCY))
+    records: Dict[str, Dict[str, str]] = {}
+    consecutive_failures = 0
+    gave_up = False
+
+    async def _one(url: str):
+        nonlocal consecutive_failures, gave_up
+        async with semaphore:
+            if gave_up:
+                return
+            record = await fetch_record(client, url)
+        if record is None:
+            consecutive_failures += 1
+            if MAX_CONSECUTIVE_FAILURES > 0 and consecutive_failures >= MAX_CONSECUTIVE_FAILURES and not gave_up:
+                gave_up = True
+                _log(f"Instagram embed pages are not returning stats ({consecutive_failures} failures in a row); "
+                     f"using Apify for the remaining posts")
+            return
+        consecutive_failures = 0
+        records[url] = record
+        if on_result is not None:
+            on_result(record)
+
+    async with make_client() as client:
+        await asyncio.gather(*(_one(url) for url in urls))
+    return records, [url for url in urls if url not in records]
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: python ig_http.py saved_embed_page.html POST_URL", file=sys.stderr)
+        sys.exit(2)
+    with open(sys.argv[1], "r", encoding="utf-8", errors="replace") as fh:
+        html = fh.read()
+    url = igmod.canonicalize_instagram_url(sys.argv[2]) or sys.argv[2]
+    print(json.dumps(parse_embed_page(html, url), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,13 +3,22 @@ import os
 from urllib.parse import urlparse
 import re
 import sys
-import time
 import main as tiktokmod
 import ig as igmod
 import youtube as ytmod
 import twitter as twmod
-from apify_client import ApifyClient
-from TikTokApi import TikTokApi
+import link_resolver
+import url_index as urlidx
+import tiktok_pool
+import tiktok_http
+import ig_http
+import stats_cache
+import refresh_policy
+import sheets_io
+import run_journal
+import progress
+import blocking_io
+import apify_runs
 import gspread
 from google.oauth2.service_account import Credentials as ServiceAccountCredentials
 from google.oauth2.credentials import Credentials as UserCredentials
@@ -48,23 +57,85 @@ SHEETS_ALLOW_TITLE = bool(os.getenv("GOOGLE_SHEETS_ALLOW_TITLE", ""))
 OAUTH_CLIENT_FILE = Path(os.getenv("GOOGLE_OAUTH_CLIENT", str(CONFIG_DIR / "oauth_client.json")))
 OAUTH_TOKEN_FILE = Path(os.getenv("GOOGLE_OAUTH_TOKEN", str(CONFIG_DIR / "token.json")))
 
-# Batch size for processing URLs (to avoid rate limits and timeouts)
+# Starting TikTok concurrency; the window then adapts between TIKTOK_MIN_CONCURRENCY
+# and TIKTOK_MAX_CONCURRENCY based on success rate and latency (see tiktok_pool)
 TIKTOK_BATCH_SIZE = int(os.getenv("TIKTOK_BATCH_SIZE", "20"))
+TIKTOK_PROGRESS_EVERY = 20
+
+# Batch size for processing URLs (to avoid rate limits and timeouts)
 INSTAGRAM_BATCH_SIZE = int(os.getenv("INSTAGRAM_BATCH_SIZE", "50"))
 
-# Delay between batches in seconds (to manage rate limits)
-TIKTOK_BATCH_DELAY = float(os.getenv("TIKTOK_BATCH_DELAY", "1.0"))
+# Delay between starting batch runs in seconds (to manage rate limits)
 INSTAGRAM_BATCH_DELAY = float(os.getenv("INSTAGRAM_BATCH_DELAY", "2.0"))
 
+# Rows read, fetched and written per chunk (0 = whole range at once). With chunking, each
+# chunk is written while the next one is fetched, keeping memory bounded on huge sheets
+SHEETS_CHUNK_ROWS = int(os.getenv("SHEETS_CHUNK_ROWS", "0"))
+
+# Per-platform fetch deadlines in seconds (0 = no deadline). Platforms run concurrently,
+# so a platform that hits its deadline doesn't hold back the others.
+STAGE_TIMEOUTS = {
+    urlidx.TIKTOK: float(os.getenv("TIKTOK_STAGE_TIMEOUT", "1200")),
+    urlidx.YOUTUBE: float(os.getenv("YOUTUBE_STAGE_TIMEOUT", "300")),
+    urlidx.TWITTER: float(os.getenv("TWITTER_STAGE_TIMEOUT", "1200")),
+    urlidx.INSTAGRAM: float(os.getenv("INSTAGRAM_STAGE_TIMEOUT", "1200")),
+}
+
+# Platforms whose stats are fetched (Facebook links are recognised but not supported yet)
+FETCH_PLATFORMS = (urlidx.TIKTOK, urlidx.YOUTUBE, urlidx.TWITTER, urlidx.INSTAGRAM)
+
 def _log(msg: str, file=sys.stderr):
-    """Print progress/status messages to stderr so stdout can be piped."""
+    """Print progress/status messages to stderr so stdout can be piped (and to the job's subscribers)."""
     print(msg, file=file, flush=True)
+    progress.bus.log(msg)
 
-def _progress(current: int, total: int, prefix: str = "Progress"):
-    """Simple progress indicator."""
+def _progress(current: int, total: int, prefix: str = "Progress", platform: str = "", ok: Optional[int] = None):
+    """Simple progress indicator; also publishes a structured fetch event for the platform."""
     if total > 0:
         pct = (current / total) * 100
         _log(f"{prefix}: {current}/{total} ({pct:.1f}%)")
+    if platform:
+        progress.bus.report("fetch", current, total, platform=platform, ok=ok,
+                            failed=(current - ok) if ok is not None else None)
+
+async def _run_stage(name: str, coro, timeout: float, partial: Optional[list] = None):
+    """
+    Await one platform's fetch with its own deadline.
+    Failures and timeouts are logged so other platforms can continue; they yield the
+    results in partial (filled by the fetch's on_results as results arrive), so what was
+    fetched before the deadline is still written.
+
+    Returns:
+        (results, finished) where finished is False if the stage stopped early
+    """
+    try:
+        if timeout and timeout > 0:
+            return await asyncio.wait_for(coro, timeout=timeout), True
+        return await coro, True
+    except asyncio.TimeoutError:
+        _log(f"Warning: {name} fetch timed out after {timeout:.0f}s")
+    except Exception as e:
+        _log(f"Warning: {name} fetch failed: {type(e).__name__}: {e}")
+    if partial:
+        _log(f"Keeping {len(partial)} {name} result(s) that arrived before it stopped")
+    _log("Continuing with other platforms...")
+    return list(partial or []), False
+
+def _stats_from_results(results) -> Dict[str, Dict[str, str]]:
+    """Map successful (url, views, likes, comments, date, status) results to stats dicts by url."""
+    stats_by_url: Dict[str, Dict[str, str]] = {}
+    for (u, views, likes, comments, post_date, status) in results:
+        if status == "ok":
+            stats_by_url[u] = {"views": views, "likes": likes, "comments": comments, "date": post_date}
+    return stats_by_url
+
+def _ig_stats_from_records(records) -> Dict[str, Dict[str, str]]:
+    """Map Instagram stats records (see igmod.stats_record) to stats dicts by canonical post URL."""
+    return {r["url"]: {k: v for k, v in r.items() if k != "url"} for r in records}
+
+def _keys_with_status(results, status: str) -> List[str]:
+    """URLs from (url, ..., status) results that ended with the given status."""
+    return [r[0] for r in results if r[-1] == status]
 
 def classify_urls(all_urls):
     tiktok_urls = tiktokmod.tiktok_video_links(all_urls)
@@ -84,96 +155,75 @@ def classify_urls(all_urls):
     return tiktok_urls, youtube_urls, twitter_urls, instagram_urls
 
 
-async def run_tiktok(urls, show_progress=False):
-    """Fetch TikTok stats with batch processing and error handling."""
+async def run_tiktok(urls, show_progress=False, on_results=None):
+    """
+    Fetch TikTok stats, over plain HTTP first (tiktok_http) and through a browser session
+    pool with adaptive concurrency for the videos that fails for.
+    on_results, if given, is called with [result] as each video finishes.
+    """
     if not urls:
         return []
     
-    all_results = []
     total = len(urls)
+    succeeded = 0
+    done = 0
+
+    def _on_result(_result):
+        nonlocal succeeded, done
+        done += 1
+        if _result[-1] == "ok":
+            succeeded += 1
+        if on_results:
+            on_results([_result])
+        # Every result goes to the progress bus (which coalesces); the log only gets every Nth
+        progress.bus.report("fetch", done, total, platform=urlidx.TIKTOK, ok=succeeded, failed=done - succeeded)
+        if show_progress and (done % TIKTOK_PROGRESS_EVERY == 0 or done == total):
+            _progress(done, total, "Fetching TikTok")
     
-    # Configuration
-    timeout = int(os.getenv("PLAYWRIGHT_TIMEOUT", "120000"))  # 120 seconds default (Railway needs more time)
-    preferred_browser = os.getenv("TIKTOK_BROWSER", "chromium")
-    
-    # Try multiple strategies for session creation
-    browsers_to_try = [preferred_browser]
-    if preferred_browser != "firefox":
-        browsers_to_try.append("firefox")
-    
-    api_initialized = False
-    last_error = None
+    if show_progress:
+        _progress(0, total, "Fetching TikTok", urlidx.TIKTOK)
+
+    results_by_url = {}
+    browser_urls = list(urls)
+    if tiktok_http.ENABLED:
+        results_by_url, browser_urls = await tiktok_http.fetch_many(urls, on_result=_on_result)
+        if browser_urls:
+            _log(f"TikTok: {len(results_by_url)}/{total} fetched over HTTP, {len(browser_urls)} need the browser")
+        if not browser_urls:
+            return [results_by_url[url] for url in urls]
     
-    for browser in browsers_to_try:
-        try:
-            _log(f"Attempting TikTok session with {browser} browser (timeout: {timeout}ms)...")
-            async with TikTokApi() as api:
-                try:
-                    await api.create_sessions(
-                        ms_tokens=[tiktokmod.MS_TOKEN] if tiktokmod.MS_TOKEN else None,
-                        num_sessions=1,
-                        sleep_after=1,
-                        headless=True,
-                        browser=browser,
-                        timeout=timeout,
-                    )
-                    api_initialized = True
-                    _log(f"✓ TikTok session created successfully with {browser}")
-                except Exception as session_error:
-                    _log(f"✗ Failed to create TikTok session with {browser}: {session_error}")
-                    last_error = session_error
-                    continue
-                
-                # If we get here, session was created successfully
-                # Process in batches to avoid overwhelming the API
-                for i in range(0, total, TIKTOK_BATCH_SIZE):
-                    batch = urls[i:i + TIKTOK_BATCH_SIZE]
-                    if show_progress:
-                        _progress(i, total, "Fetching TikTok")
-                    
-                    try:
-                        batch_results = await asyncio.gather(
-                            *(tiktokmod.fetch_stats(api, u) for u in batch),
-                            return_exceptions=True
-                        )
-                        # Handle individual failures
-                        for idx, result in enumerate(batch_results):
-                            if isinstance(result, Exception):
-                                url = batch[idx]
-                                _log(f"Warning: TikTok fetch failed for {url}: {result}")
-                                all_results.append((url, "", "", "", "", f"error:{type(result).__name__}"))
-                            else:
-                                all_results.append(result)
-                    except Exception as e:
-                        _log(f"Error processing TikTok batch {i//TIKTOK_BATCH_SIZE + 1}: {e}")
-                        # Add error results for all URLs in failed batch
-                        for url in batch:
-                            all_results.append((url, "", "", "", "", f"batch_error:{type(e).__name__}"))
-                    
-                    # Configurable delay between batches to manage rate limits
-                    if i + TIKTOK_BATCH_SIZE < total:
-                        await asyncio.sleep(TIKTOK_BATCH_DELAY)
-                
-                if show_progress:
-                    _progress(total, total, "Fetching TikTok")
-                
-                # Success! Return results
-                return all_results
-                
-        except Exception as e:
-            _log(f"Error with {browser} browser: {e}")
-            last_error = e
-            continue
+    # Reuse the warm pool when running inside the web server, otherwise launch one for this run
+    shared_pool = tiktok_pool.get_shared_pool()
+    pool = shared_pool or tiktok_pool.TikTokSessionPool()
+    try:
+        await pool.ensure_started()
+    except Exception as e:
+        _log(f"Fatal: {e}")
+        _log(f"Tip: Try setting PLAYWRIGHT_TIMEOUT=180000 or higher in Railway environment variables")
+        # Return error results for the URLs that still needed the browser
+        results_by_url.update({url: (url, "", "", "", "", f"fatal:session_timeout") for url in browser_urls})
+        return [results_by_url[url] for url in urls]
     
-    # If we get here, all browsers failed
-    _log(f"Fatal: Could not initialize TikTok API with any browser. Last error: {last_error}")
-    _log(f"Tip: Try setting PLAYWRIGHT_TIMEOUT=180000 or higher in Railway environment variables")
-    # Return error results for all URLs
-    return [(url, "", "", "", "", f"fatal:session_timeout") for url in urls]
+    try:
+        # Continuous work queue: concurrency adapts to success rate and latency
+        browser_results = await pool.fetch_many(
+            browser_urls, initial_concurrency=TIKTOK_BATCH_SIZE,
+            on_result=lambda _done, _total, result: _on_result(result),
+        )
+        results_by_url.update(zip(browser_urls, browser_results))
+        return [results_by_url[url] for url in urls]
+    finally:
+        if pool is not shared_pool:
+            await pool.close()
 
 
-def run_youtube(urls, show_progress=False):
-    """Fetch YouTube stats using YouTube Data API v3."""
+async def run_youtube(urls, show_progress=False, on_results=None, video_ids=None):
+    """
+    Fetch YouTube stats using YouTube Data API v3, 50 videos per request.
+    video_ids maps each URL to its video ID (as already parsed into the URL index);
+    without it the IDs are extracted from the URLs.
+    on_results, if given, is called with the results once they are in.
+    """
     if not urls:
         return []
     
@@ -182,29 +232,45 @@ def run_youtube(urls, show_progress=False):
         _log("Warning: YOUTUBE_API_KEY not set, skipping YouTube videos")
         return [(url, "", "", "", "", "no_api_key") for url in urls]
     
-    results = []
     total = len(urls)
+    if show_progress:
+        _progress(0, total, "Fetching YouTube", urlidx.YOUTUBE)
     
-    for i, url in enumerate(urls):
-        if show_progress and i % 10 == 0:
-            _progress(i, total, "Fetching YouTube")
-        
-        try:
-            url_result, views, likes, comments, status = ytmod.fetch_stats_by_url(url, api_key=api_key)
-            # Return empty date for consistency with TikTok format (url, views, likes, comments, date, status)
-            results.append((url, views, likes, comments, "", status))
-        except Exception as e:
-            _log(f"Warning: YouTube fetch failed for {url}: {e}")
-            results.append((url, "", "", "", "", f"error:{type(e).__name__}"))
+    if video_ids is None:
+        video_ids = {url: ytmod.extract_video_id(url) for url in urls}
+    try:
+        stats_by_id = await ytmod.fetch_videos_stats_batched(
+            [vid for vid in video_ids.values() if vid], api_key=api_key
+        )
+    except Exception as e:
+        _log(f"Warning: YouTube batch fetch failed: {e}")
+        return [(url, "", "", "", "", f"error:{type(e).__name__}") for url in urls]
+    
+    results = []
+    for url in urls:
+        vid = video_ids.get(url, "")
+        if not vid:
+            results.append((url, "", "", "", "", "invalid_url"))
+            continue
+        _vid, views, likes, comments, status = stats_by_id.get(vid, (vid, "", "", "", "not_found"))
+        # Return empty date for consistency with TikTok format (url, views, likes, comments, date, status)
+        results.append((url, views, likes, comments, "", status))
     
+    if on_results:
+        on_results(results)
     if show_progress:
-        _progress(total, total, "Fetching YouTube")
+        _progress(total, total, "Fetching YouTube", urlidx.YOUTUBE, ok=sum(1 for r in results if r[-1] == "ok"))
     
     return results
 
 
-def run_twitter(urls, show_progress=False):
-    """Fetch Twitter/X stats using Twitter API v2."""
+async def run_twitter(urls, show_progress=False, on_results=None, tweet_ids=None):
+    """
+    Fetch Twitter/X stats using Twitter API v2, 100 tweets per request.
+    tweet_ids maps each URL to its tweet ID (as already parsed into the URL index);
+    without it the IDs are extracted from the URLs.
+    on_results, if given, is called with the results once they are in.
+    """
     if not urls:
         return []
     
@@ -213,77 +279,125 @@ def run_twitter(urls, show_progress=False):
         _log("Warning: TWITTER_BEARER_TOKEN not set, skipping Twitter posts")
         return [(url, "", "", "", "", "no_bearer_token") for url in urls]
     
-    results = []
     total = len(urls)
+    if show_progress:
+        _progress(0, total, "Fetching Twitter", urlidx.TWITTER)
     
-    for i, url in enumerate(urls):
-        if show_progress and i % 10 == 0:
-            _progress(i, total, "Fetching Twitter")
-        
-        try:
-            url_result, views, likes, retweets, replies, status = twmod.fetch_tweet_stats_by_url(url, bearer_token=bearer_token)
-            # Return format: (url, views, likes, retweets+comments, date, status)
-            # Combine retweets and replies into one "comments" field for consistency
-            combined_comments = str(int(retweets or 0) + int(replies or 0)) if retweets or replies else ""
-            results.append((url, views, likes, combined_comments, "", status))
-        except Exception as e:
-            _log(f"Warning: Twitter fetch failed for {url}: {e}")
-            results.append((url, "", "", "", "", f"error:{type(e).__name__}"))
+    if tweet_ids is None:
+        tweet_ids = {url: twmod.extract_tweet_id(url) for url in urls}
+    try:
+        stats_by_id = await twmod.fetch_tweets_stats_bulk(
+            [tid for tid in tweet_ids.values() if tid], bearer_token=bearer_token
+        )
+    except Exception as e:
+        _log(f"Warning: Twitter bulk fetch failed: {e}")
+        return [(url, "", "", "", "", f"error:{type(e).__name__}") for url in urls]
     
+    results = []
+    for url in urls:
+        tid = tweet_ids.get(url, "")
+        if not tid:
+            results.append((url, "", "", "", "", "invalid_url"))
+            continue
+        _tid, views, likes, retweets, replies, status = stats_by_id.get(tid, (tid, "", "", "", "", "not_found"))
+        # Return format: (url, views, likes, retweets+comments, date, status)
+        # Combine retweets and replies into one "comments" field for consistency
+        combined_comments = str(_to_int(retweets) + _to_int(replies)) if retweets or replies else ""
+        results.append((url, views, likes, combined_comments, "", status))
+    
+    if on_results:
+        on_results(results)
     if show_progress:
-        _progress(total, total, "Fetching Twitter")
+        _progress(total, total, "Fetching Twitter", urlidx.TWITTER, ok=sum(1 for r in results if r[-1] == "ok"))
     
     return results
 
 
-def run_instagram(urls, show_progress=False):
-    """Fetch Instagram stats with error handling and validation."""
+async def run_instagram(urls, show_progress=False, on_results=None):
+    """
+    Fetch Instagram stats with error handling and validation.
+    Public posts are read from their embed pages first (ig_http); only the posts that
+    fails for go to Apify. Each Apify batch is a separate actor run; up to
+    INSTAGRAM_MAX_PARALLEL_RUNS run at once.
+    Datasets are streamed with only the fields the stats need and reduced to compact
+    stats records (igmod.stats_record) as they arrive; those records are returned.
+    on_results, if given, is called with each batch's records as the batch finishes
+    (and with [record] for each post read directly).
+    """
     if not urls:
         return []
     
+    total = len(urls)
+    all_records = []
+    done = 0
+    
+    def _on_direct_record(record):
+        nonlocal done
+        done += 1
+        all_records.append(record)
+        if on_results:
+            on_results([record])
+        progress.bus.report("fetch", done, total, platform=urlidx.INSTAGRAM, ok=len(all_records), failed=0)
+    
+    if show_progress:
+        _progress(0, total, "Fetching Instagram", urlidx.INSTAGRAM)
+    
+    apify_urls = list(urls)
+    if ig_http.ENABLED:
+        _direct, apify_urls = await ig_http.fetch_many(urls, on_result=_on_direct_record)
+        if apify_urls:
+            _log(f"Instagram: {total - len(apify_urls)}/{total} read from embed pages, {len(apify_urls)} need Apify")
+        else:
+            if show_progress:
+                _progress(total, total, "Fetching Instagram", urlidx.INSTAGRAM, ok=len(all_records))
+            return all_records
+    
     if not igmod.API_TOKEN or not igmod.API_TOKEN.startswith("apify_api_"):
         _log("Warning: APIFY_TOKEN not set or invalid. Instagram scraping may fail.")
         _log("Get your token at https://console.apify.com/account/integrations")
     
     try:
-        client = ApifyClient(igmod.API_TOKEN)
+        client = apify_runs.make_client(igmod.API_TOKEN)
         
         # Process in batches if there are many URLs
-        all_items = []
-        total = len(urls)
-        
-        for i in range(0, total, INSTAGRAM_BATCH_SIZE):
-            batch = urls[i:i + INSTAGRAM_BATCH_SIZE]
-            if show_progress:
-                _progress(i, total, "Fetching Instagram")
-            
-            run_input = {
+        batches = [apify_urls[i:i + INSTAGRAM_BATCH_SIZE] for i in range(0, len(apify_urls), INSTAGRAM_BATCH_SIZE)]
+        run_inputs = [
+            {
                 "directUrls": batch,
                 "resultsType": "posts",
                 "resultsLimit": 1,
                 "addParentData": False,
             }
-            
-            try:
-                run = client.actor(igmod.ACTOR_ID).call(run_input=run_input)
-                items = list(client.dataset(run["defaultDatasetId"]).iterate_items())
-                all_items.extend(items)
-            except Exception as e:
-                _log(f"Error processing Instagram batch {i//INSTAGRAM_BATCH_SIZE + 1}: {e}")
-                # Continue with other batches rather than failing completely
-                continue
-            
-            # Configurable delay between batches to manage rate limits
-            if i + INSTAGRAM_BATCH_SIZE < total:
-                time.sleep(INSTAGRAM_BATCH_DELAY)
+            for batch in batches
+        ]
+        
+        # Run starts are spaced by INSTAGRAM_BATCH_DELAY to manage rate limits
+        runs = apify_runs.run_batches(client, igmod.ACTOR_ID, run_inputs, start_delay=INSTAGRAM_BATCH_DELAY,
+                                      fields=igmod.DATASET_FIELDS, transform=igmod.stats_record)
+        try:
+            async for index, records, error in runs:
+                done += len(batches[index])
+                if error is not None:
+                    _log(f"Error processing Instagram batch {index + 1}: {error}")
+                    # Continue with other batches rather than failing completely
+                    continue
+                all_records.extend(records)
+                if on_results:
+                    on_results(records)
+                if show_progress and done < total:
+                    _progress(done, total, "Fetching Instagram", urlidx.INSTAGRAM, ok=len(all_records))
+        finally:
+            # Aborts runs still in progress if this stage is cancelled (e.g. its deadline)
+            await runs.aclose()
         
         if show_progress:
-            _progress(total, total, "Fetching Instagram")
+            _progress(total, total, "Fetching Instagram", urlidx.INSTAGRAM, ok=len(all_records))
         
-        return all_items
+        return all_records
     except Exception as e:
         _log(f"Fatal error with Instagram API: {e}")
-        return []
+        # Keep what was read directly
+        return all_records
 
 
 # Note: url.txt functionality removed - use Google Sheets workflow only
@@ -304,14 +418,6 @@ def _col_index(headers: List[str], name_candidates: List[str]) -> int:
             return names.index(cand_l) + 1  # 1-based for Sheets
     return 0
 
-def _col_letter(col_index: int) -> str:
-    s = ""
-    n = col_index
-    while n > 0:
-        n, r = divmod(n - 1, 26)
-        s = chr(65 + r) + s
-    return s
-
 def _to_int(value: str) -> int:
     s = (value or "").strip()
     if not s:
@@ -321,53 +427,6 @@ def _to_int(value: str) -> int:
     except Exception:
         return 0
 
-def _extract_account_name(url: str) -> str:
-    """Extract account/username from TikTok or Instagram URL."""
-    if not url:
-        return ""
-    
-    try:
-        parsed = urlparse(url)
-        path = parsed.path.strip('/')
-        parts = path.split('/')
-        
-        # TikTok URLs: tiktok.com/@username/video/...
-        if "tiktok.com" in parsed.netloc.lower():
-            for part in parts:
-                if part.startswith('@'):
-                    return part[1:]  # Remove @ symbol
-        
-        # Instagram URLs: instagram.com/username/p/... or instagram.com/reel/...
-        elif "instagram.com" in parsed.netloc.lower():
-            # Skip common paths that aren't usernames
-            skip_paths = {'p', 'reel', 'reels', 'tv', 'stories'}
-            if parts and parts[0] and parts[0] not in skip_paths:
-                return parts[0]
-            # If first part is 'p' or 'reel', there's no username in URL
-            return ""
-        
-        return ""
-    except Exception:
-        return ""
-
-def _extract_channel(url: str) -> str:
-    """Extract platform/channel (TikTok or IG) from URL."""
-    if not url:
-        return ""
-    
-    try:
-        parsed = urlparse(url)
-        netloc = parsed.netloc.lower()
-        
-        if "tiktok.com" in netloc:
-            return "TikTok"
-        elif "instagram.com" in netloc:
-            return "IG"
-        
-        return ""
-    except Exception:
-        return ""
-
 def _load_config_defaults() -> Dict[str, str]:
     try:
         import json
@@ -496,6 +555,31 @@ def connect_sheets_oauth(scopes: List[str] = None, client_secrets_path: str = ""
     OAUTH_TOKEN_FILE.write_text(creds.to_json())
     return str(OAUTH_TOKEN_FILE)
 
+# Totals reported by update_sheet_views_likes_comments
+SUMMARY_KEYS = ("rows_read", "urls", "fetched", "fetched_ok", "from_cache", "replayed",
+                "rows_changed", "unsupported", "chunks", "cells_written")
+
+def _write_blocks(ws, blocks: List[sheets_io.CellBlock]) -> int:
+    """Write changed-cell blocks for one span of rows in as few batched requests as possible.
+
+    Returns:
+        Number of cells written
+    """
+    if not blocks:
+        _log("No cell values changed - nothing to write")
+        return 0
+    try:
+        num_cells = sum(block.num_cells for block in blocks)
+        _log(f"Writing {num_cells} changed cells in {len(blocks)} ranges...")
+        # Use value_input_option='USER_ENTERED' to interpret numbers as numbers, not text
+        num_requests = sheets_io.batch_write(ws, blocks, value_input_option='USER_ENTERED')
+        if num_requests > 1:
+            _log(f"Sent {len(blocks)} ranges in {num_requests} batched requests")
+        return num_cells
+    except Exception as e:
+        _log(f"Error writing to sheet: {e}")
+        raise
+
 async def update_sheet_views_likes_comments(
     spreadsheet: Optional[str] = None,
     worksheet: Optional[str] = None,
@@ -504,8 +588,18 @@ async def update_sheet_views_likes_comments(
     override: bool = True,
     start_row: Optional[int] = None,
     end_row: Optional[int] = None,
+    use_cache: bool = True,
+    chunk_rows: Optional[int] = None,
+    resume: bool = False,
 ):
-    """Update Google Sheet with latest stats. Production-ready with error handling and progress tracking."""
+    """
+    Update Google Sheet with latest stats. Production-ready with error handling and progress tracking.
+
+    Returns:
+        Dict of run totals (see SUMMARY_KEYS): rows read, URLs found, URLs fetched and
+        how many succeeded, served from cache or replayed, rows changed, unsupported rows
+        and chunks processed
+    """
     try:
         cfg = _load_config_defaults()
         spreadsheet_title = (spreadsheet or os.getenv("GOOGLE_SHEETS_SPREADSHEET") or cfg.get("spreadsheet") or SHEETS_SPREADSHEET)
@@ -519,15 +613,17 @@ async def update_sheet_views_likes_comments(
             )
 
         _log(f"Opening spreadsheet: {spreadsheet_title[:50]}...")
-        ws = _open_sheet(creds_path, spreadsheet_title, worksheet_name)
+        ws = await blocking_io.run_blocking(_open_sheet, creds_path, spreadsheet_title, worksheet_name)
         
-        _log("Reading sheet data...")
-        values = ws.get_all_values()
-        if not values:
+        # Run totals, returned to the caller (the web job engine reports them)
+        summary: Dict[str, int] = {key: 0 for key in SUMMARY_KEYS}
+
+        _log("Reading sheet headers...")
+        headers = await blocking_io.run_blocking(sheets_io.call_with_retry, ws.row_values, 1)
+        if not headers:
             _log("Warning: Sheet is empty")
-            return
+            return summary
         
-        headers = values[0]
         url_col = _col_index(headers, ["url", "link"])
         name_col = _col_index(headers, ["name", "username", "account", "account name"])
         channel_col = _col_index(headers, ["channel", "platform", "source"])
@@ -589,314 +685,303 @@ async def update_sheet_views_likes_comments(
         else:
             _log("Override mode: TRUE - will overwrite existing data")
 
-        # Determine row range to process
-        process_start_idx = 1  # Start from row 2 (index 1), skip header
-        process_end_idx = len(values)  # Process all rows by default
-        
-        if start_row is not None:
-            process_start_idx = max(1, start_row - 1)  # Convert to 0-based index
-            if process_start_idx >= len(values):
-                _log(f"Start row {start_row} is beyond the last row in the sheet ({len(values)})")
-                return
-        
-        if end_row is not None:
-            process_end_idx = min(len(values), end_row)
-            if end_row >= len(values):
-                _log(f"End row {end_row} is beyond the last row in the sheet ({len(values)}), processing until end")
-        
+        # Read only the mapped columns over the requested rows (not the whole sheet)
+        read_cols = [url_col, name_col, channel_col, views_col, likes_col, comments_col,
+                     impressions_col, last_changed_col, date_col]
+        first_row = max(2, start_row or 2)
+        last_row = min(end_row, ws.row_count) if end_row else ws.row_count
+        chunk_rows = SHEETS_CHUNK_ROWS if chunk_rows is None else chunk_rows
         if start_row or end_row:
-            actual_start = process_start_idx + 1
-            actual_end = process_end_idx
-            _log(f"Processing rows {actual_start} to {actual_end} (out of {len(values)} total rows)")
-        
-        # Gather rows and classify URLs (use already-fetched values)
-        row_to_url: Dict[int, str] = {}
-        tiktok_rows: List[int] = []
-        youtube_rows: List[int] = []
-        twitter_rows: List[int] = []
-        instagram_rows: List[int] = []
-        raw_urls: List[str] = []
-
-        for i in range(process_start_idx, process_end_idx):  # Skip header row (index 0) and respect row range
-            r = i + 1  # Convert to 1-based row number
-            url_val = values[i][url_col - 1] if url_col <= len(values[i]) else ""
-            # Clean URL (remove @ prefix and whitespace)
-            u = tiktokmod.clean_url(url_val)
-            if not u:
-                continue
-            row_to_url[r] = u
-            raw_urls.append(u)
-            host = (urlparse(u).netloc or "").lower()
-            # Check TikTok URLs - expand short URLs to detect if they're valid video URLs
-            if "tiktok.com" in host:
-                expanded = tiktokmod.expand_tiktok_url(u)
-                if tiktokmod.VID_RE.search(urlparse(expanded).path):
-                    tiktok_rows.append(r)
-            elif "youtube.com" in host or "youtu.be" in host:
-                youtube_rows.append(r)
-            elif "twitter.com" in host or "x.com" in host:
-                twitter_rows.append(r)
-            elif "instagram.com" in host:
-                instagram_rows.append(r)
-
-        total_urls = len(raw_urls)
-        _log(f"Found {total_urls} URLs: {len(tiktok_rows)} TikTok, {len(youtube_rows)} YouTube, {len(twitter_rows)} Twitter, {len(instagram_rows)} Instagram")
-
-        if total_urls == 0:
-            _log("No URLs found in sheet")
-            return
-
-        # Fetch TikTok stats with progress
-        tt_stats_by_url: Dict[str, Dict[str, str]] = {}
-        tt_urls_unique = tiktokmod.tiktok_video_links(raw_urls)
-        if tt_urls_unique:
-            _log(f"Fetching {len(tt_urls_unique)} TikTok videos...")
-            try:
-                results = await run_tiktok(tt_urls_unique, show_progress=True)
-            except Exception as e:
-                _log(f"Warning: TikTok fetch failed: {type(e).__name__}: {e}")
-                _log("Continuing with other platforms...")
-                results = []  # Continue with empty results
-            
-            success_count = 0
-            for (u, views, likes, comments, post_date, status) in results:
-                if status == "ok":
-                    tt_stats_by_url[u] = {"views": views, "likes": likes, "comments": comments, "date": post_date}
-                    success_count += 1
-            
-            _log(f"TikTok: {success_count}/{len(tt_urls_unique)} successful")
-
-        # Fetch YouTube stats
-        yt_stats_by_url: Dict[str, Dict[str, str]] = {}
-        yt_urls_unique = ytmod.youtube_video_links(raw_urls)
-        if yt_urls_unique:
-            _log(f"Fetching {len(yt_urls_unique)} YouTube videos...")
-            try:
-                results = run_youtube(yt_urls_unique, show_progress=True)
-            except Exception as e:
-                _log(f"Warning: YouTube fetch failed: {type(e).__name__}: {e}")
-                _log("Continuing with other platforms...")
-                results = []
-            
-            success_count = 0
-            for (u, views, likes, comments, post_date, status) in results:
-                if status == "ok":
-                    yt_stats_by_url[u] = {"views": views, "likes": likes, "comments": comments, "date": post_date}
-                    success_count += 1
-            
-            _log(f"YouTube: {success_count}/{len(yt_urls_unique)} successful")
-
-        # Fetch Twitter stats
-        tw_stats_by_url: Dict[str, Dict[str, str]] = {}
-        tw_urls_unique = twmod.twitter_links(raw_urls)
-        if tw_urls_unique:
-            _log(f"Fetching {len(tw_urls_unique)} Twitter/X posts...")
-            try:
-                results = run_twitter(tw_urls_unique, show_progress=True)
-            except Exception as e:
-                _log(f"Warning: Twitter fetch failed: {type(e).__name__}: {e}")
-                _log("Continuing with other platforms...")
-                results = []
-            
-            success_count = 0
-            for (u, views, likes, comments, post_date, status) in results:
-                if status == "ok":
-                    tw_stats_by_url[u] = {"views": views, "likes": likes, "comments": comments, "date": post_date}
-                    success_count += 1
-            
-            _log(f"Twitter: {success_count}/{len(tw_urls_unique)} successful")
-
-        # Fetch Instagram stats with progress
-        ig_stats_by_url: Dict[str, Dict[str, str]] = {}
-        ig_urls_unique = []
-        seen_ig = set()
-        for r in instagram_rows:
-            cu = igmod.canonicalize_instagram_url(row_to_url[r])
-            if cu and cu not in seen_ig:
-                ig_urls_unique.append(cu)
-                seen_ig.add(cu)
-        
-        if ig_urls_unique:
-            _log(f"Fetching {len(ig_urls_unique)} Instagram posts...")
-            items = run_instagram(ig_urls_unique, show_progress=True)
-            
-            for item in items:
-                plays, likes, comments, post_date = igmod.extract_impressions(item)
-                username = igmod.extract_username(item)
-                src = item.get("inputUrl") or item.get("url") or ""
-                cu = igmod.canonicalize_instagram_url(src) if src else ""
-                if cu:
-                    ig_stats_by_url[cu] = {
-                        "views": str(plays) if isinstance(plays, int) else "",
-                        "likes": str(likes) if isinstance(likes, int) else "",
-                        "comments": str(comments) if isinstance(comments, int) else "",
-                        "username": username,
-                        "date": post_date,
-                    }
-                    # Debug: log successful username extraction
-                    if username:
-                        _log(f"  ✓ Instagram username extracted: @{username}")
-            
-            _log(f"Instagram: {len(ig_stats_by_url)}/{len(ig_urls_unique)} successful")
-
-        # Prepare column updates (use already-fetched values to avoid extra API calls)
-        _log("Preparing sheet updates...")
-        # Extract columns from values array instead of making individual cell() API calls
-        # Only extract if column exists and only for the rows we're processing
-        existing_names = [values[i][name_col - 1] if name_col > 0 and name_col <= len(values[i]) else "" for i in range(process_start_idx, process_end_idx)] if name_col else []
-        existing_channels = [values[i][channel_col - 1] if channel_col > 0 and channel_col <= len(values[i]) else "" for i in range(process_start_idx, process_end_idx)] if channel_col else []
-        existing_views = [values[i][views_col - 1] if views_col > 0 and views_col <= len(values[i]) else "" for i in range(process_start_idx, process_end_idx)] if views_col else []
-        existing_likes = [values[i][likes_col - 1] if likes_col > 0 and likes_col <= len(values[i]) else "" for i in range(process_start_idx, process_end_idx)] if likes_col else []
-        existing_comments = [values[i][comments_col - 1] if comments_col > 0 and comments_col <= len(values[i]) else "" for i in range(process_start_idx, process_end_idx)] if comments_col else []
-        existing_impressions = [values[i][impressions_col - 1] if impressions_col > 0 and impressions_col <= len(values[i]) else "" for i in range(process_start_idx, process_end_idx)] if impressions_col else []
-        existing_dates = [values[i][date_col - 1] if date_col > 0 and date_col <= len(values[i]) else "" for i in range(process_start_idx, process_end_idx)] if date_col else []
-
-        new_names: List[str] = []
-        new_channels: List[str] = []
-        new_views: List[str] = []
-        new_likes: List[str] = []
-        new_comments: List[str] = []
-        new_impressions: List[str] = []
-        new_dates: List[str] = []
-        changed_rows: List[bool] = []
-        unsupported_count = 0
+            _log(f"Processing rows {first_row} to {end_row or 'end'}")
+        if chunk_rows > 0:
+            _log(f"Streaming mode: processing {chunk_rows} rows at a time")
+
+        # The cache is opened even with use_cache=False: that run refetches everything but
+        # still stores its results for later runs
+        cache = None
+        try:
+            cache = await blocking_io.run_blocking(stats_cache.get_cache)
+        except Exception as e:
+            _log(f"Warning: Stats cache unavailable, fetching everything: {type(e).__name__}: {e}")
+
+        journal = run_journal.RunJournal.for_run(spreadsheet_title, worksheet_name, start_row, end_row)
+        replay = await blocking_io.run_blocking(journal.load) if resume else {}
+        if resume:
+            n_replay = sum(len(v) for v in replay.values())
+            if n_replay:
+                _log(f"Resuming: {n_replay} results from the interrupted run will be replayed")
+            else:
+                _log("Resume requested but no journal was found for this sheet/range - starting fresh")
+        journal.start(resume=bool(replay))
+
+        async def _fetch_and_merge(rows: List[List[str]], first_row: int):
+            """
+            Resolve, fetch and merge one span of rows (rows[0] is sheet row first_row).
+            Returns (blocks to write, counts for the SUMMARY_KEYS totals).
+            """
+            # Gather rows (use already-fetched values)
+            row_to_url: Dict[int, str] = {}
+
+            for i in range(len(rows)):
+                r = first_row + i  # 1-based sheet row
+                url_val = rows[i][url_col - 1] if url_col <= len(rows[i]) else ""
+                # Clean URL (remove @ prefix and whitespace)
+                u = tiktokmod.clean_url(url_val)
+                if not u:
+                    continue
+                row_to_url[r] = u
+
+            # Expand all TikTok short links once, concurrently (cached across runs)
+            tt_short_urls = [u for u in row_to_url.values() if tiktokmod.is_tiktok_short_url(u)]
+            if tt_short_urls:
+                _log(f"Resolving {len(set(tt_short_urls))} TikTok short links...")
+                progress.bus.report("resolve", 0, len(set(tt_short_urls)))
+            tt_expanded = await link_resolver.resolve_tiktok_urls(tt_short_urls)
+            if tt_short_urls:
+                progress.bus.report("resolve", len(set(tt_short_urls)), len(set(tt_short_urls)))
+
+            # Parse and classify every URL exactly once; all later stages use this index
+            url_index = urlidx.build_url_index(row_to_url, tt_expanded)
+            platform_rows: Dict[str, int] = {}
+            for entry in url_index.values():
+                if entry.platform == urlidx.TIKTOK and not entry.key:
+                    continue  # TikTok link that is not a video
+                platform_rows[entry.platform] = platform_rows.get(entry.platform, 0) + 1
+
+            total_urls = len(url_index)
+            _log(
+                f"Found {total_urls} URLs: {platform_rows.get(urlidx.TIKTOK, 0)} TikTok, "
+                f"{platform_rows.get(urlidx.YOUTUBE, 0)} YouTube, {platform_rows.get(urlidx.TWITTER, 0)} Twitter, "
+                f"{platform_rows.get(urlidx.INSTAGRAM, 0)} Instagram"
+            )
+
+            if total_urls == 0:
+                return [], {}
+
+            keys_by_platform = {p: urlidx.unique_keys(url_index, p) for p in FETCH_PLATFORMS}
+
+            # Serve entries that are not due for a refresh yet (by post age and view velocity) from the cache
+            cached_by_platform: Dict[str, Dict[str, dict]] = {p: {} for p in FETCH_PLATFORMS}
+            if cache is not None and use_cache:
+                try:
+                    for p in FETCH_PLATFORMS:
+                        if keys_by_platform[p]:
+                            stored = await blocking_io.run_blocking(cache.get_many, keys_by_platform[p])
+                            cached_by_platform[p] = refresh_policy.not_due(p, stored)
+                except Exception as e:
+                    _log(f"Warning: Stats cache unavailable, fetching everything: {type(e).__name__}: {e}")
+                    cached_by_platform = {p: {} for p in FETCH_PLATFORMS}
+            # Results journaled by an interrupted earlier run are replayed instead of refetched
+            replayed_by_platform = {
+                p: {k: replay[p][k] for k in keys_by_platform[p] if k in replay.get(p, {})}
+                for p in FETCH_PLATFORMS
+            }
+            to_fetch = {
+                p: [k for k in keys_by_platform[p]
+                    if k not in cached_by_platform[p] and k not in replayed_by_platform[p]]
+                for p in FETCH_PLATFORMS
+            }
+
+            tt_urls_unique = to_fetch[urlidx.TIKTOK]
+            yt_urls_unique = to_fetch[urlidx.YOUTUBE]
+            tw_urls_unique = to_fetch[urlidx.TWITTER]
+            ig_urls_unique = to_fetch[urlidx.INSTAGRAM]
+            for p, noun in ((urlidx.TIKTOK, "TikTok videos"), (urlidx.YOUTUBE, "YouTube videos"),
+                            (urlidx.TWITTER, "Twitter/X posts"), (urlidx.INSTAGRAM, "Instagram posts")):
+                n_cached = len(cached_by_platform[p])
+                n_replayed = len(replayed_by_platform[p])
+                skipped = []
+                if n_cached:
+                    skipped.append(f"{n_cached} not due for refresh, served from cache")
+                if n_replayed:
+                    skipped.append(f"{n_replayed} replayed from journal")
+                if to_fetch[p]:
+                    suffix = f" ({'; '.join(skipped)})" if skipped else ""
+                    _log(f"Fetching {len(to_fetch[p])} {noun}...{suffix}")
+                elif skipped:
+                    _log(f"No {noun} to fetch ({'; '.join(skipped)})")
+
+            # Fetch all platforms concurrently; each stage keeps its own limits and deadline,
+            # so the total time is roughly that of the slowest platform
+            # Every result is journaled as soon as it arrives so an interrupted run can resume,
+            # and kept in arrived so a stage that hits its deadline still returns what it got
+            arrived: Dict[str, list] = {p: [] for p in FETCH_PLATFORMS}
+
+            def _journal(platform: str, to_stats=_stats_from_results):
+                def _on_results(results):
+                    arrived[platform].extend(results)
+                    journal.record_many(platform, to_stats(results))
+                return _on_results
+
+            stages = await asyncio.gather(
+                _run_stage("TikTok", run_tiktok(tt_urls_unique, show_progress=True, on_results=_journal(urlidx.TIKTOK)), STAGE_TIMEOUTS[urlidx.TIKTOK], arrived[urlidx.TIKTOK]),
+                _run_stage("YouTube", run_youtube(yt_urls_unique, show_progress=True, on_results=_journal(urlidx.YOUTUBE), video_ids=urlidx.platform_ids(url_index, urlidx.YOUTUBE)), STAGE_TIMEOUTS[urlidx.YOUTUBE], arrived[urlidx.YOUTUBE]),
+                _run_stage("Twitter", run_twitter(tw_urls_unique, show_progress=True, on_results=_journal(urlidx.TWITTER), tweet_ids=urlidx.platform_ids(url_index, urlidx.TWITTER)), STAGE_TIMEOUTS[urlidx.TWITTER], arrived[urlidx.TWITTER]),
+                _run_stage("Instagram", run_instagram(ig_urls_unique, show_progress=True, on_results=_journal(urlidx.INSTAGRAM, _ig_stats_from_records)), STAGE_TIMEOUTS[urlidx.INSTAGRAM], arrived[urlidx.INSTAGRAM]),
+            )
+            (tt_results, _), (yt_results, _), (tw_results, _), (ig_records, _) = stages
+            # Rows a stopped stage never got to are left exactly as they are
+            unfinished_by_platform: Dict[str, set] = {}
+            for p, (results, finished) in zip(FETCH_PLATFORMS, stages):
+                if not finished:
+                    answered = {r["url"] if isinstance(r, dict) else r[0] for r in results}
+                    unfinished_by_platform[p] = set(to_fetch[p]) - answered
+
+            tt_stats_by_url = _stats_from_results(tt_results)
+            if tt_urls_unique:
+                _log(f"TikTok: {len(tt_stats_by_url)}/{len(tt_urls_unique)} successful")
+
+            yt_stats_by_url = _stats_from_results(yt_results)
+            if yt_urls_unique:
+                _log(f"YouTube: {len(yt_stats_by_url)}/{len(yt_urls_unique)} successful")
+
+            tw_stats_by_url = _stats_from_results(tw_results)
+            if tw_urls_unique:
+                _log(f"Twitter: {len(tw_stats_by_url)}/{len(tw_urls_unique)} successful")
+
+            ig_stats_by_url = _ig_stats_from_records(ig_records)
+            for ig_stats in ig_stats_by_url.values():
+                # Debug: log successful username extraction
+                if ig_stats["username"]:
+                    _log(f"  ✓ Instagram username extracted: @{ig_stats['username']}")
+            if ig_urls_unique:
+                _log(f"Instagram: {len(ig_stats_by_url)}/{len(ig_urls_unique)} successful")
+
+            stats_by_platform: Dict[str, Dict[str, Dict[str, str]]] = {
+                urlidx.TIKTOK: tt_stats_by_url,
+                urlidx.YOUTUBE: yt_stats_by_url,
+                urlidx.TWITTER: tw_stats_by_url,
+                urlidx.INSTAGRAM: ig_stats_by_url,
+            }
+            counts = {
+                "urls": total_urls,
+                "fetched": sum(len(keys) for keys in to_fetch.values()),
+                "fetched_ok": sum(len(stats) for stats in stats_by_platform.values()),
+                "from_cache": sum(len(entries) for entries in cached_by_platform.values()),
+                "replayed": sum(len(entries) for entries in replayed_by_platform.values()),
+            }
+
+            if cache is not None:
+                # Remember fresh results (and definitive "not found" answers) for later runs.
+                # Replayed results are stored as of when the interrupted run fetched them, so
+                # they don't look fresher than they are to the refresh policy.
+                not_found_by_platform = {
+                    urlidx.YOUTUBE: _keys_with_status(yt_results, "not_found"),
+                    urlidx.TWITTER: _keys_with_status(tw_results, "not_found"),
+                }
+                try:
+                    for p in FETCH_PLATFORMS:
+                        await blocking_io.run_blocking(cache.put_many, p, stats_by_platform[p], status="ok")
+                        await blocking_io.run_blocking(
+                            cache.put_many, p, {k: {} for k in not_found_by_platform.get(p, [])}, status="not_found"
+                        )
+                        replayed_by_time: Dict[float, Dict[str, Dict[str, str]]] = {}
+                        for key, stats in replayed_by_platform[p].items():
+                            fetched_at = journal.loaded_times.get(p, {}).get(key)
+                            if fetched_at is not None:
+                                replayed_by_time.setdefault(fetched_at, {})[key] = stats
+                        for fetched_at, entries in replayed_by_time.items():
+                            await blocking_io.run_blocking(cache.put_many, p, entries, status="ok",
+                                                           fetched_at=fetched_at)
+                except Exception as e:
+                    _log(f"Warning: Failed to update stats cache: {type(e).__name__}: {e}")
+
+            for p in FETCH_PLATFORMS:
+                stats_by_platform[p].update(replayed_by_platform[p])
+
+            if cache is not None:
+
+                for p in FETCH_PLATFORMS:
+                    for key, entry in cached_by_platform[p].items():
+                        if entry["status"] == "ok":
+                            stats_by_platform[p][key] = stats_cache.stats_from_entry(entry)
+
+            # Prepare column updates (use already-fetched values to avoid extra API calls)
+            _log("Preparing sheet updates...")
+            # Extract columns from values array instead of making individual cell() API calls
+            # Only extract if column exists and only for the rows we're processing
+            existing_names = [rows[i][name_col - 1] if name_col > 0 and name_col <= len(rows[i]) else "" for i in range(len(rows))] if name_col else []
+            existing_channels = [rows[i][channel_col - 1] if channel_col > 0 and channel_col <= len(rows[i]) else "" for i in range(len(rows))] if channel_col else []
+            existing_views = [rows[i][views_col - 1] if views_col > 0 and views_col <= len(rows[i]) else "" for i in range(len(rows))] if views_col else []
+            existing_likes = [rows[i][likes_col - 1] if likes_col > 0 and likes_col <= len(rows[i]) else "" for i in range(len(rows))] if likes_col else []
+            existing_comments = [rows[i][comments_col - 1] if comments_col > 0 and comments_col <= len(rows[i]) else "" for i in range(len(rows))] if comments_col else []
+            existing_impressions = [rows[i][impressions_col - 1] if impressions_col > 0 and impressions_col <= len(rows[i]) else "" for i in range(len(rows))] if impressions_col else []
+            existing_dates = [rows[i][date_col - 1] if date_col > 0 and date_col <= len(rows[i]) else "" for i in range(len(rows))] if date_col else []
+
+            new_names: List[str] = []
+            new_channels: List[str] = []
+            new_views: List[str] = []
+            new_likes: List[str] = []
+            new_comments: List[str] = []
+            new_impressions: List[str] = []
+            new_dates: List[str] = []
+            changed_rows: List[bool] = []
+            unsupported_count = 0
         
-        # Process only the rows in the specified range
-        for i, r in enumerate(range(process_start_idx + 1, process_end_idx + 1)):
-            u = row_to_url.get(r, "")
-            n = existing_names[i] if i < len(existing_names) else ""
-            ch = existing_channels[i] if i < len(existing_channels) else ""
-            v = existing_views[i] if i < len(existing_views) else ""
-            l = existing_likes[i] if i < len(existing_likes) else ""
-            c = existing_comments[i] if i < len(existing_comments) else ""
+            # Process only the rows in the specified range
+            for i in range(len(rows)):
+                r = first_row + i
+                n = existing_names[i] if i < len(existing_names) else ""
+                ch = existing_channels[i] if i < len(existing_channels) else ""
+                v = existing_views[i] if i < len(existing_views) else ""
+                l = existing_likes[i] if i < len(existing_likes) else ""
+                c = existing_comments[i] if i < len(existing_comments) else ""
             
-            # Store original values for override check
-            orig_n = n
-            orig_ch = ch
-            orig_v = v
-            orig_l = l
-            orig_c = c
+                # Store original values for override check
+                orig_n = n
+                orig_ch = ch
+                orig_v = v
+                orig_l = l
+                orig_c = c
             
-            # Helper to check if a value is empty
-            def _is_empty(val: str) -> bool:
-                return not (val or "").strip()
+                # Helper to check if a value is empty
+                def _is_empty(val: str) -> bool:
+                    return not (val or "").strip()
             
-            # Check if URL is from an unsupported platform (Facebook, X/Twitter)
-            host = (urlparse(u).netloc or "").lower()
-            is_unsupported = any(platform in host for platform in [
-                "facebook.com", "fb.com", "fb.watch",
-                "twitter.com", "x.com"
-            ])
+                # Check if URL is from an unsupported platform (Facebook, X/Twitter)
+                entry = url_index.get(r)
+                platform = entry.platform if entry else ""
+                is_unsupported = platform in (urlidx.FACEBOOK, urlidx.TWITTER)
             
-            # Variables to store post date
-            post_date = ""
+                # Variables to store post date
+                post_date = ""
             
-            # If unsupported platform, keep all existing data and skip processing
-            if is_unsupported:
-                unsupported_count += 1
-                # Just append existing values without modification
-                if name_col:
-                    new_names.append(n)
-                if channel_col:
-                    new_channels.append(ch)
-                if views_col:
-                    new_views.append(v)
-                if likes_col:
-                    new_likes.append(l)
-                if comments_col:
-                    new_comments.append(c)
-                if impressions_col:
-                    orig_imp = existing_impressions[i] if i < len(existing_impressions) else ""
-                    new_impressions.append(orig_imp)
-                if date_col:
-                    orig_date = existing_dates[i] if i < len(existing_dates) else ""
-                    new_dates.append(orig_date)
-                changed_rows.append(False)
-                continue
-            
-            # For TikTok, expand short URLs first to extract account name and fetch stats
-            if "tiktok.com" in host:
-                # Expand short URL to match the key used in tt_stats_by_url
-                expanded_u = tiktokmod.expand_tiktok_url(u)
-                
-                # Extract account name from expanded URL if not already present
-                if name_col and not n:
-                    n = _extract_account_name(expanded_u)
-                
-                # Extract channel from URL if not already present
-                if channel_col and not ch:
-                    ch = _extract_channel(expanded_u)
-                
-                stats = tt_stats_by_url.get(expanded_u)
-                if stats:
-                    if views_col:
-                        new_v = stats.get("views", v)
-                        v = new_v if (override or _is_empty(orig_v)) else orig_v
-                    if likes_col:
-                        new_l = stats.get("likes", l)
-                        l = new_l if (override or _is_empty(orig_l)) else orig_l
-                    if comments_col:
-                        new_c = stats.get("comments", c)
-                        c = new_c if (override or _is_empty(orig_c)) else orig_c
-                    # Get post date from TikTok stats
-                    post_date = stats.get("date", "")
-            # For YouTube, extract channel and fetch stats
-            elif "youtube.com" in host or "youtu.be" in host:
-                # Canonicalize YouTube URL
-                canonical_yt_url = ytmod.canonicalize_youtube_url(u)
-                
-                # Extract channel from URL if not already present
-                if channel_col and not ch:
-                    ch = "YouTube"
-                
-                stats = yt_stats_by_url.get(canonical_yt_url) if canonical_yt_url else None
-                if stats:
+                # If unsupported platform (or its fetch stopped before this row), keep all
+                # existing data and skip processing
+                is_unfinished = bool(entry and entry.key in unfinished_by_platform.get(platform, ()))
+                if is_unsupported or is_unfinished:
+                    if is_unsupported:
+                        unsupported_count += 1
+                    # Just append existing values without modification
+                    if name_col:
+                        new_names.append(n)
+                    if channel_col:
+                        new_channels.append(ch)
                     if views_col:
-                        new_v = stats.get("views", v)
-                        v = new_v if (override or _is_empty(orig_v)) else orig_v
+                        new_views.append(v)
                     if likes_col:
-                        new_l = stats.get("likes", l)
-                        l = new_l if (override or _is_empty(orig_l)) else orig_l
-                    if comments_col:
-                        new_c = stats.get("comments", c)
-                        c = new_c if (override or _is_empty(orig_c)) else orig_c
-                    # Get post date from YouTube stats
-                    post_date = stats.get("date", "")
-            # For Twitter/X, extract username and fetch stats
-            elif "twitter.com" in host or "x.com" in host:
-                # Canonicalize Twitter URL
-                canonical_tw_url = twmod.canonicalize_twitter_url(u)
-                
-                # Extract channel/username from URL if not already present
-                if channel_col and not ch:
-                    ch = "Twitter"
-                
-                stats = tw_stats_by_url.get(canonical_tw_url) if canonical_tw_url else None
-                if stats:
-                    if views_col:
-                        new_v = stats.get("views", v)
-                        v = new_v if (override or _is_empty(orig_v)) else orig_v
-                    if likes_col:
-                        new_l = stats.get("likes", l)
-                        l = new_l if (override or _is_empty(orig_l)) else orig_l
+                        new_likes.append(l)
                     if comments_col:
-                        # For Twitter, comments = retweets + replies combined
-                        new_c = stats.get("comments", c)
-                        c = new_c if (override or _is_empty(orig_c)) else orig_c
-                    # Get post date from Twitter stats
-                    post_date = stats.get("date", "")
-            elif "instagram.com" in host:
-                # Extract account name from URL if not already present
-                if name_col and not n:
-                    n = _extract_account_name(u)
-                
-                # Extract channel from URL if not already present
-                if channel_col and not ch:
-                    ch = _extract_channel(u)
-                
-                stats = ig_stats_by_url.get(igmod.canonicalize_instagram_url(u))
+                        new_comments.append(c)
+                    if impressions_col:
+                        orig_imp = existing_impressions[i] if i < len(existing_impressions) else ""
+                        new_impressions.append(orig_imp)
+                    if date_col:
+                        orig_date = existing_dates[i] if i < len(existing_dates) else ""
+                        new_dates.append(orig_date)
+                    changed_rows.append(False)
+                    continue
+            
+                # Extract account name and channel from the parsed URL if not already present
+                # (TikTok short links were expanded before parsing, so they carry the @account too)
+                if name_col and not n and entry:
+                    n = entry.account
+                if channel_col and not ch and entry:
+                    ch = entry.channel
+            
+                stats = stats_by_platform.get(platform, {}).get(entry.key) if entry and entry.key else None
                 if stats:
-                    # Use username from API if name is empty (override URL extraction)
+                    # Use username from API if name is empty (e.g. Instagram /p/ URLs carry no username)
                     if name_col and not n and stats.get("username"):
                         n = stats.get("username")
                     if views_col:
@@ -906,135 +991,182 @@ async def update_sheet_views_likes_comments(
                         new_l = stats.get("likes", l)
                         l = new_l if (override or _is_empty(orig_l)) else orig_l
                     if comments_col:
+                        # For Twitter, comments = retweets + replies combined
                         new_c = stats.get("comments", c)
                         c = new_c if (override or _is_empty(orig_c)) else orig_c
-                    # Get post date from Instagram stats
+                    # Get post date from the video/post stats
                     post_date = stats.get("date", "")
-            else:
-                # For other platforms (YouTube, Facebook, etc.), extract from URL
-                if name_col and not n:
-                    n = _extract_account_name(u)
-                
-                if channel_col and not ch:
-                    ch = _extract_channel(u)
             
-            # Calculate impressions
-            orig_imp = existing_impressions[i] if i < len(existing_impressions) else ""
-            if impressions_col:
-                if (v or "").strip() == "":
-                    imp = "unable"
+                # Calculate impressions
+                orig_imp = existing_impressions[i] if i < len(existing_impressions) else ""
+                if impressions_col:
+                    if (v or "").strip() == "":
+                        imp = "unable"
+                    else:
+                        imp = str(_to_int(v) + _to_int(l) + _to_int(c))
+                    # Only update impressions if override=True or original is empty
+                    if not override and not _is_empty(orig_imp):
+                        imp = orig_imp
                 else:
-                    imp = str(_to_int(v) + _to_int(l) + _to_int(c))
-                # Only update impressions if override=True or original is empty
-                if not override and not _is_empty(orig_imp):
-                    imp = orig_imp
-            else:
-                imp = ""
+                    imp = ""
             
-            # Apply override logic for name and channel too
-            if name_col:
-                # Only update name if override=True or original is empty
-                final_n = n if (override or _is_empty(orig_n)) else orig_n
-                new_names.append(final_n)
-            if channel_col:
-                # Only update channel if override=True or original is empty
-                final_ch = ch if (override or _is_empty(orig_ch)) else orig_ch
-                new_channels.append(final_ch)
-            if views_col:
-                new_views.append(v)
-            if likes_col:
-                new_likes.append(l)
-            if comments_col:
-                new_comments.append(c)
-            if impressions_col:
-                new_impressions.append(imp)
+                # Apply override logic for name and channel too
+                if name_col:
+                    # Only update name if override=True or original is empty
+                    final_n = n if (override or _is_empty(orig_n)) else orig_n
+                    new_names.append(final_n)
+                if channel_col:
+                    # Only update channel if override=True or original is empty
+                    final_ch = ch if (override or _is_empty(orig_ch)) else orig_ch
+                    new_channels.append(final_ch)
+                if views_col:
+                    new_views.append(v)
+                if likes_col:
+                    new_likes.append(l)
+                if comments_col:
+                    new_comments.append(c)
+                if impressions_col:
+                    new_impressions.append(imp)
             
-            # Handle date column - use post date from video/post
-            if date_col:
-                orig_date = existing_dates[i] if i < len(existing_dates) else ""
-                # Use the post_date from the video/post data
-                # Only update if we have a post_date and (override=True or original is empty)
-                if post_date and (override or _is_empty(orig_date)):
-                    final_date = post_date
-                else:
-                    final_date = orig_date
-                new_dates.append(final_date)
+                # Handle date column - use post date from video/post
+                if date_col:
+                    orig_date = existing_dates[i] if i < len(existing_dates) else ""
+                    # Use the post_date from the video/post data
+                    # Only update if we have a post_date and (override=True or original is empty)
+                    if post_date and (override or _is_empty(orig_date)):
+                        final_date = post_date
+                    else:
+                        final_date = orig_date
+                    new_dates.append(final_date)
             
-            was_changed = False
-            if name_col and (final_n or "") != ((existing_names[i] if i < len(existing_names) else "") or ""):
-                was_changed = True
-            if channel_col and (final_ch or "") != ((existing_channels[i] if i < len(existing_channels) else "") or ""):
-                was_changed = True
-            if views_col and (v or "") != ((existing_views[i] if i < len(existing_views) else "") or ""):
-                was_changed = True
-            if likes_col and (l or "") != ((existing_likes[i] if i < len(existing_likes) else "") or ""):
-                was_changed = True
-            if comments_col and (c or "") != ((existing_comments[i] if i < len(existing_comments) else "") or ""):
-                was_changed = True
-            if impressions_col and (imp or "") != ((existing_impressions[i] if i < len(existing_impressions) else "") or ""):
-                was_changed = True
-            if date_col and (final_date or "") != ((existing_dates[i] if i < len(existing_dates) else "") or ""):
-                was_changed = True
+                was_changed = False
+                if name_col and (final_n or "") != ((existing_names[i] if i < len(existing_names) else "") or ""):
+                    was_changed = True
+                if channel_col and (final_ch or "") != ((existing_channels[i] if i < len(existing_channels) else "") or ""):
+                    was_changed = True
+                if views_col and (v or "") != ((existing_views[i] if i < len(existing_views) else "") or ""):
+                    was_changed = True
+                if likes_col and (l or "") != ((existing_likes[i] if i < len(existing_likes) else "") or ""):
+                    was_changed = True
+                if comments_col and (c or "") != ((existing_comments[i] if i < len(existing_comments) else "") or ""):
+                    was_changed = True
+                if impressions_col and (imp or "") != ((existing_impressions[i] if i < len(existing_impressions) else "") or ""):
+                    was_changed = True
+                if date_col and (final_date or "") != ((existing_dates[i] if i < len(existing_dates) else "") or ""):
+                    was_changed = True
             
-            changed_rows.append(bool(was_changed))
+                changed_rows.append(bool(was_changed))
 
-        # Write updates to sheet
-        _log("Writing updates to sheet...")
-        start = process_start_idx + 1  # Convert to 1-based row number
-        end = process_end_idx
-        
-        try:
-            # Only update columns that exist
-            # Use value_input_option='USER_ENTERED' to interpret numbers as numbers, not text
-            if name_col and new_names:
-                rng_names = f"{_col_letter(name_col)}{start}:{_col_letter(name_col)}{end}"
-                ws.update(rng_names, [[x] for x in new_names], value_input_option='USER_ENTERED')
-            
-            if channel_col and new_channels:
-                rng_channels = f"{_col_letter(channel_col)}{start}:{_col_letter(channel_col)}{end}"
-                ws.update(rng_channels, [[x] for x in new_channels], value_input_option='USER_ENTERED')
-            
-            if views_col and new_views:
-                rng_views = f"{_col_letter(views_col)}{start}:{_col_letter(views_col)}{end}"
-                ws.update(rng_views, [[x] for x in new_views], value_input_option='USER_ENTERED')
-            
-            if likes_col and new_likes:
-                rng_likes = f"{_col_letter(likes_col)}{start}:{_col_letter(likes_col)}{end}"
-                ws.update(rng_likes, [[x] for x in new_likes], value_input_option='USER_ENTERED')
-            
-            if comments_col and new_comments:
-                rng_comments = f"{_col_letter(comments_col)}{start}:{_col_letter(comments_col)}{end}"
-                ws.update(rng_comments, [[x] for x in new_comments], value_input_option='USER_ENTERED')
-            
-            if impressions_col and new_impressions:
-                rng_impressions = f"{_col_letter(impressions_col)}{start}:{_col_letter(impressions_col)}{end}"
-                ws.update(rng_impressions, [[x] for x in new_impressions], value_input_option='USER_ENTERED')
-            
-            if date_col and new_dates:
-                rng_dates = f"{_col_letter(date_col)}{start}:{_col_letter(date_col)}{end}"
-                ws.update(rng_dates, [[x] for x in new_dates], value_input_option='USER_ENTERED')
+            # Only update columns that exist, and within them only the cells whose value changed
+            columns = [
+                (name_col, existing_names, new_names),
+                (channel_col, existing_channels, new_channels),
+                (views_col, existing_views, new_views),
+                (likes_col, existing_likes, new_likes),
+                (comments_col, existing_comments, new_comments),
+                (impressions_col, existing_impressions, new_impressions),
+                (date_col, existing_dates, new_dates),
+            ]
 
             # Update "last changed" column if present
             if last_changed_col:
-                existing_changed = [values[i][last_changed_col - 1] if last_changed_col <= len(values[i]) else "" for i in range(process_start_idx, process_end_idx)]
+                existing_changed = [rows[i][last_changed_col - 1] if last_changed_col <= len(rows[i]) else "" for i in range(len(rows))]
                 try:
                     now_human = datetime.now(timezone.utc).strftime("%-I:%M %b %d")
                 except Exception:
                     now_human = datetime.now(timezone.utc).strftime("%I:%M %b %d").lstrip("0")
                 last_changed_out: List[str] = []
-                for i in range(0, end - start + 1):
+                for i in range(len(rows)):
                     last_changed_out.append(now_human if changed_rows[i] else (existing_changed[i] or ""))
-                rng_changed = f"{_col_letter(last_changed_col)}{start}:{_col_letter(last_changed_col)}{end}"
-                ws.update(rng_changed, [[x] for x in last_changed_out], value_input_option='USER_ENTERED')
-        except Exception as e:
-            _log(f"Error writing to sheet: {e}")
-            raise
+                columns.append((last_changed_col, existing_changed, last_changed_out))
+
+            blocks = sheets_io.changed_blocks([c for c in columns if c[0] and c[2]], first_row)
+            counts["rows_changed"] = sum(changed_rows)
+            counts["unsupported"] = unsupported_count
+            return blocks, counts
+
+        def _span_end(span_first: int) -> int:
+            return last_row if chunk_rows <= 0 else min(last_row, span_first + chunk_rows - 1)
+
+        async def _read_span(span_first: int) -> List[List[str]]:
+            if span_first > last_row:
+                return []
+            span_last = _span_end(span_first)
+            if chunk_rows > 0:
+                _log(f"Reading rows {span_first}-{span_last}...")
+            else:
+                _log("Reading sheet data...")
+            # Open-ended read when no row range was given, so the whole sheet comes back in one call
+            read_last = span_last if (chunk_rows > 0 or end_row) else None
+            return await blocking_io.run_blocking(sheets_io.read_columns, ws, read_cols, span_first, read_last)
+
+        # Walk the rows in chunks (one chunk covering everything when streaming is off).
+        # Each chunk is written in the background while the next one is fetched, so finished
+        # chunks are saved even if a later one fails. The walk covers every row up to
+        # last_row; blank rows inside the range don't end it.
+        if chunk_rows > 0 and not end_row:
+            # No end row given: find where the URLs end once, with one read of the URL column
+            url_rows = await blocking_io.run_blocking(sheets_io.read_columns, ws, [url_col], first_row)
+            last_row = first_row + len(url_rows) - 1
+        write_task: Optional[asyncio.Task] = None
+        chunk_first = first_row
+        rows_expected = (last_row - first_row + 1) if (end_row or chunk_rows > 0) else 0
+        chunks_written = 0
+        try:
+            rows = await _read_span(chunk_first)
+            while True:
+                chunk_last = _span_end(chunk_first)
+                more = chunk_rows > 0 and chunk_last < last_row
+                # Read one chunk ahead so it's ready when this one is done
+                next_rows = await _read_span(chunk_last + 1) if more else []
+                if chunk_rows > 0:
+                    # Reads drop trailing blank rows; count the whole chunk as read
+                    rows += [[] for _ in range(chunk_last - chunk_first + 1 - len(rows))]
+                summary["rows_read"] += len(rows)
+                progress.bus.report("read", summary["rows_read"], max(rows_expected, summary["rows_read"]))
+
+                if any(any(cell for cell in row) for row in rows):
+                    blocks, counts = await _fetch_and_merge(rows, chunk_first)
+                    for key, value in counts.items():
+                        summary[key] += value
+                    summary["chunks"] += 1
+                    if write_task is not None:
+                        task, write_task = write_task, None
+                        summary["cells_written"] += await task
+                        chunks_written += 1
+                        progress.bus.report("write", chunks_written, summary["chunks"])
+                    _log("Writing updates to sheet...")
+                    write_task = asyncio.create_task(blocking_io.run_blocking(_write_blocks, ws, blocks))
+
+                if not more:
+                    break
+                chunk_first, rows = chunk_last + 1, next_rows
+
+            if write_task is not None:
+                task, write_task = write_task, None
+                summary["cells_written"] += await task
+                chunks_written += 1
+                progress.bus.report("write", chunks_written, summary["chunks"])
+        finally:
+            if write_task is not None:
+                await write_task
+            journal.close()
+
+        # Every chunk made it to the sheet, so there is nothing left to resume
+        journal.discard()
+
+        if summary["rows_read"] == 0 and start_row is not None:
+            _log(f"No data at or after start row {start_row}")
+            return summary
+        if summary["urls"] == 0:
+            _log("No URLs found in sheet")
+            return summary
 
         # Summary
-        num_changed = sum(changed_rows)
-        if unsupported_count > 0:
-            _log(f"Skipped {unsupported_count} unsupported platform(s) (Facebook/X) - keeping existing data")
-        _log(f"✓ Complete! Updated {num_changed}/{total_urls} rows")
+        if summary["unsupported"] > 0:
+            _log(f"Skipped {summary['unsupported']} unsupported platform(s) (Facebook/X) - keeping existing data")
+        _log(f"✓ Complete! Updated {summary['rows_changed']}/{summary['urls']} rows")
+        return summary
         
     except ValueError as e:
         raise  # Re-raise validation errors
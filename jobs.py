@@ -0,0 +1,213 @@
+"""
+Background job engine for sheet updates
+Requests enqueue a job and return its id straight away; a bounded pool of workers runs
+the jobs so long sheets don't depend on one HTTP connection staying open
+"""
+import asyncio
+import os
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import progress
+
+# Jobs executed at the same time
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+
+# Jobs waiting for a worker before new submissions are refused
+JOB_MAX_QUEUED = int(os.getenv("JOB_MAX_QUEUED", "50"))
+
+# Hard limit on one job's run time in seconds (0 = none)
+JOB_TIMEOUT = float(os.getenv("JOB_TIMEOUT", "7200"))
+
+# How long finished jobs stay queryable, in seconds
+JOB_RETENTION = float(os.getenv("JOB_RETENTION_SECONDS", "21600"))
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED_STATES = {SUCCEEDED, FAILED}
+
+SHUTDOWN_ERROR = "Server shut down while the job was running. Run it again to continue where it stopped."
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while JOB_MAX_QUEUED jobs are already waiting."""
+
+
+class JobConflictError(Exception):
+    """Raised when a job is submitted while another one for the same target is queued or running."""
+
+    def __init__(self, job: "Job"):
+        super().__init__("An update for this sheet and row range is already queued or running")
+        self.job = job
+
+
+class Job:
+    """One queued or running update and everything known about its outcome."""
+
+    def __init__(self, user_id: str, params: Dict[str, Any]):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.params = params
+        self.state = QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Dict[str, Any] = {}
+        self.error = ""
+        self.exclusive_key = ""
+
+    def to_dict(self) -> Dict[str, Any]:
+        now = time.time()
+        started = self.started_at
+        finished = self.finished_at
+        return {
+            "job_id": self.id,
+            "state": self.state,
+            "params": {k: v for k, v in self.params.items() if k != "creds_path"},
+            "counts": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": started,
+            "finished_at": finished,
+            "queued_seconds": round((started or now) - self.created_at, 1),
+            "run_seconds": round((finished or now) - started, 1) if started else None,
+        }
+
+
+class JobManager:
+    """
+    Bounded worker pool over an asyncio queue.
+
+    runner(**job.params) is awaited for each job; its return value (a counts dict)
+    becomes job.result. Exceptions mark the job failed with the error message.
+    With exclusive_key, jobs whose params map to the same key never run at the same
+    time: submitting one while another is queued or running is refused.
+    """
+
+    def __init__(self, runner: Callable[..., Awaitable[Optional[Dict[str, Any]]]],
+                 workers: int = JOB_WORKERS, max_queued: int = JOB_MAX_QUEUED,
+                 timeout: float = JOB_TIMEOUT, retention: float = JOB_RETENTION,
+                 exclusive_key: Optional[Callable[[Dict[str, Any]], str]] = None):
+        self.runner = runner
+        self.exclusive_key = exclusive_key
+        self.workers = max(1, workers)
+        self.max_queued = max(1, max_queued)
+        self.timeout = timeout
+        self.retention = retention
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        """Spawn the workers (call from inside the running event loop)."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Cancel the workers; running and still-queued jobs are marked failed."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        queue, self._queue = self._queue, None
+        while queue is not None and not queue.empty():
+            job = queue.get_nowait()
+            job.state = FAILED
+            job.error = SHUTDOWN_ERROR
+            job.finished_at = time.time()
+            self._publish_state(job)
+
+    def submit(self, user_id: str, params: Dict[str, Any]) -> Job:
+        """
+        Queue a job. Raises QueueFullError when too many jobs are waiting, and
+        JobConflictError when a job with the same exclusive key is queued or running.
+        """
+        if self._queue is None:
+            raise RuntimeError("Job manager is not running")
+        self._prune()
+        key = self.exclusive_key(params) if self.exclusive_key else ""
+        if key:
+            for other in self._jobs.values():
+                if other.exclusive_key == key and other.state not in FINISHED_STATES:
+                    raise JobConflictError(other)
+        if self._queue.qsize() >= self.max_queued:
+            raise QueueFullError(f"{self._queue.qsize()} jobs already waiting")
+        job = Job(user_id, params)
+        job.exclusive_key = key
+        self._jobs[job.id] = job
+        self._queue.put_nowait(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def queue_position(self, job: Job) -> int:
+        """1-based position among queued jobs (0 once it has started)."""
+        if job.state != QUEUED:
+            return 0
+        queued = [j for j in self._jobs.values() if j.state == QUEUED]
+        return queued.index(job) + 1
+
+    def status(self) -> Dict[str, int]:
+        states: Dict[str, int] = {}
+        for job in self._jobs.values():
+            states[job.state] = states.get(job.state, 0) + 1
+        return {"workers": self.workers, **states}
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.retention
+        for job_id in [j.id for j in self._jobs.values()
+                       if j.state in FINISHED_STATES and (j.finished_at or 0) < cutoff]:
+            del self._jobs[job_id]
+            progress.bus.forget(job_id)
+
+    def _publish_state(self, job: Job) -> None:
+        progress.bus.publish("job", {"type": "job", "state": job.state, "counts": job.result,
+                                     "error": job.error}, job.id)
+
+    async def _run(self, job: Job) -> None:
+        job.state = RUNNING
+        job.started_at = time.time()
+        # Stage progress published anywhere below this task is attributed to this job
+        progress.current_job.set(job.id)
+        self._publish_state(job)
+        try:
+            coro = self.runner(**job.params)
+            if self.timeout and self.timeout > 0:
+                result = await asyncio.wait_for(coro, timeout=self.timeout)
+            else:
+                result = await coro
+            job.result = result or {}
+            job.state = SUCCEEDED
+        except asyncio.TimeoutError:
+            job.state = FAILED
+            job.error = (f"Job timed out after {self.timeout / 60:.0f} minutes. "
+                         f"Run it again to continue where it stopped.")
+        except asyncio.CancelledError:
+            job.state = FAILED
+            job.error = SHUTDOWN_ERROR
+            raise
+        except Exception as e:
+            job.state = FAILED
+            job.error = str(e)
+            print(f"ERROR: Job {job.id} failed: {e}")
+            traceback.print_exc()
+        finally:
+            job.finished_at = time.time()
+            self._publish_state(job)
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
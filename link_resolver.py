@@ -0,0 +1,156 @@
+"""
+TikTok short-link resolver
+Expands tiktok.com/t/..., vm.tiktok.com and vt.tiktok.com share links concurrently
+on a pooled async HTTP client, with a persistent short -> canonical cache
+"""
+import asyncio
+import json
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+import blocking_io
+import main as tiktokmod
+
+CONFIG_DIR = Path(os.getenv("TOOL_CONFIG_DIR", str(Path.home() / ".tool_google")))
+CACHE_FILE = Path(os.getenv("TIKTOK_LINK_CACHE", str(CONFIG_DIR / "tiktok_links.json")))
+
+# Maximum number of short links resolved at the same time
+MAX_IN_FLIGHT = int(os.getenv("TIKTOK_RESOLVE_CONCURRENCY", "16"))
+
+# Short -> canonical mappings never change, so the cache has no expiry
+_cache: Optional[Dict[str, str]] = None
+_cache_lock = threading.Lock()
+
+
+def _load_cache() -> Dict[str, str]:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            try:
+                data = json.loads(CACHE_FILE.read_text())
+                _cache = data if isinstance(data, dict) else {}
+            except Exception:
+                _cache = {}
+        return _cache
+
+
+def _save_cache() -> None:
+    with _cache_lock:
+        if not _cache:
+            return
+        try:
+            CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            tmp = CACHE_FILE.with_suffix(".tmp")
+            tmp.write_text(json.dumps(_cache))
+            tmp.replace(CACHE_FILE)
+        except Exception as e:
+            print(f"Warning: Failed to save TikTok link cache: {e}", file=sys.stderr)
+
+
+def _is_video_url(url: str) -> bool:
+    return bool(tiktokmod.VID_RE.search(urlparse(url).path))
+
+
+async def _resolve_one(client: httpx.AsyncClient, url: str, max_retries: int) -> Optional[str]:
+    """
+    Follow the redirects of a single short link.
+    Returns the expanded video URL, or None if it could not be resolved.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            # Stream so only the redirect chain is read, not the full video page
+            async with client.stream("GET", url) as response:
+                expanded_url = str(response.url)
+            if _is_video_url(expanded_url):
+                return expanded_url
+
+            # If expansion didn't give us a video URL, try HEAD as fallback
+            response = await client.head(url)
+            expanded_url = str(response.url)
+            if _is_video_url(expanded_url):
+                return expanded_url
+            return None
+        except (httpx.TimeoutException, httpx.TransportError) as e:
+            if attempt < max_retries:
+                await asyncio.sleep(0.5 * (attempt + 1))  # 0.5s, 1s
+                continue
+            print(f"Warning: Failed to expand URL {url}: {type(e).__name__}: {e}", file=sys.stderr)
+        except Exception as e:
+            # Non-retryable error, fail immediately
+            print(f"Warning: Failed to expand URL {url}: {type(e).__name__}: {e}", file=sys.stderr)
+            return None
+    return None
+
+
+async def resolve_tiktok_urls(
+    urls: Iterable[str],
+    timeout: float = 10,
+    max_retries: int = 2,
+    max_in_flight: Optional[int] = None,
+) -> Dict[str, str]:
+    """
+    Expand TikTok short links in bulk.
+
+    Links are deduplicated, served from the persistent cache when possible, and the
+    rest are resolved concurrently (bounded by max_in_flight) on one pooled client.
+
+    Args:
+        urls: Cleaned URLs (non-short links are passed through unchanged)
+        timeout: Per-request timeout in seconds (default: 10)
+        max_retries: Retry attempts for timeouts/connection errors (default: 2)
+        max_in_flight: Concurrent resolutions (default: TIKTOK_RESOLVE_CONCURRENCY)
+
+    Returns:
+        Dict mapping each input URL to its expanded URL (or itself if not a short
+        link or if expansion failed)
+    """
+    # Reading and rewriting the cache file is blocking I/O, so it runs off the event loop
+    cache = await blocking_io.run_blocking(_load_cache)
+    expanded: Dict[str, str] = {}
+    pending = []
+    for u in urls:
+        if u in expanded:
+            continue
+        if not tiktokmod.is_tiktok_short_url(u):
+            expanded[u] = u
+        elif u in cache:
+            expanded[u] = cache[u]
+        else:
+            expanded[u] = u
+            pending.append(u)
+
+    if not pending:
+        return expanded
+
+    limit = max(1, max_in_flight or MAX_IN_FLIGHT)
+    semaphore = asyncio.Semaphore(limit)
+    limits = httpx.Limits(max_connections=limit, max_keepalive_connections=limit)
+
+    async with httpx.AsyncClient(
+        headers=tiktokmod.BROWSER_HEADERS,
+        follow_redirects=True,
+        timeout=timeout,
+        limits=limits,
+    ) as client:
+        async def _bounded(u: str):
+            async with semaphore:
+                return u, await _resolve_one(client, u, max_retries)
+
+        results = await asyncio.gather(*(_bounded(u) for u in pending))
+
+    resolved = 0
+    with _cache_lock:
+        for u, full in results:
+            if full:
+                expanded[u] = full
+                cache[u] = full
+                resolved += 1
+    if resolved:
+        await blocking_io.run_blocking(_save_cache)
+    return expanded
@@ -4,7 +4,7 @@ import os
 from pathlib import Path
 from urllib.parse import urlparse
 import re
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 import gspread
 from google.oauth2.service_account import Credentials
 from apify_client import ApifyClient
@@ -14,6 +14,19 @@ import requests
 VID_RE = re.compile(r"/video/(\d+)")
 MS_TOKEN = os.environ.get("ms_token")
 
+# Hosts that only serve share redirects (vm.tiktok.com/XXX, vt.tiktok.com/XXX)
+SHORT_LINK_HOSTS = {"vm.tiktok.com", "vt.tiktok.com"}
+
+# Headers that mimic a real browser request (TikTok rejects bare clients)
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1'
+}
+
 def clean_url(url: str) -> str:
     """
     Remove common prefixes that shouldn't be in URLs.
@@ -33,9 +46,23 @@ def clean_url(url: str) -> str:
     
     return url
 
+def is_tiktok_short_url(url: str) -> bool:
+    """
+    Check if a URL is a TikTok share link that must be expanded before use.
+    Covers tiktok.com/t/XXX as well as the vm.tiktok.com and vt.tiktok.com hosts.
+    """
+    try:
+        parsed = urlparse(url)
+    except ValueError:
+        return False
+    host = (parsed.netloc or "").lower()
+    if host in SHORT_LINK_HOSTS:
+        return True
+    return "tiktok.com" in host and parsed.path.startswith("/t/")
+
 def expand_tiktok_url(url: str, timeout: int = 10, max_retries: int = 2) -> str:
     """
-    Expand TikTok short URLs (e.g., tiktok.com/t/XXX) to full URLs.
+    Expand TikTok short URLs (e.g., tiktok.com/t/XXX, vm.tiktok.com/XXX) to full URLs.
     Returns the expanded URL if successful, otherwise returns the original URL.
     
     Args:
@@ -47,20 +74,9 @@ def expand_tiktok_url(url: str, timeout: int = 10, max_retries: int = 2) -> str:
         Expanded URL if successful, original URL otherwise
     """
     try:
-        parsed = urlparse(url)
-        host = (parsed.netloc or "").lower()
-        
-        # Check if this is a TikTok short URL (format: tiktok.com/t/XXX)
-        if "tiktok.com" in host and parsed.path.startswith("/t/"):
-            # Use proper headers to mimic a real browser request
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Accept-Encoding': 'gzip, deflate',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1'
-            }
+        # Check if this is a TikTok short URL (tiktok.com/t/XXX, vm.tiktok.com/XXX, vt.tiktok.com/XXX)
+        if is_tiktok_short_url(url):
+            headers = BROWSER_HEADERS
             
             # Retry logic for transient failures
             last_exception = None
@@ -117,12 +133,20 @@ def load_https_links(path="url.txt"):
             result.append(cleaned)
     return result
 
-def tiktok_video_links(urls):
+def tiktok_video_links(urls, expanded_urls: Optional[Dict[str, str]] = None):
+    """
+    Filter TikTok video URLs, expanding short links.
+    If expanded_urls (cleaned URL -> expanded URL, e.g. from link_resolver) is given,
+    it is used instead of resolving each short link with a blocking request.
+    """
     keep = []
     for u in urls:
         # Clean URL first (remove @ prefix, etc.), then expand short URLs
         cleaned = clean_url(u)
-        expanded = expand_tiktok_url(cleaned)
+        if expanded_urls is not None:
+            expanded = expanded_urls.get(cleaned, cleaned)
+        else:
+            expanded = expand_tiktok_url(cleaned)
         p = urlparse(expanded)
         host = (p.netloc or "").lower()
         if "tiktok.com" in host and VID_RE.search(p.path):
@@ -133,40 +157,43 @@ def tiktok_video_links(urls):
             out.append(u); seen.add(u)
     return out
 
-async def fetch_stats(api: TikTokApi, url: str, max_retries: int = 2):
+def to_int_str(value) -> str:
+    """Count from the TikTok API (int or string, possibly with commas) as a plain integer string."""
+    try:
+        if value is None or value == "":
+            return "0"
+        if isinstance(value, str):
+            cleaned = value.replace(",", "")
+            return str(int(float(cleaned))) if "." in cleaned else str(int(cleaned))
+        return str(int(value))
+    except Exception:
+        return "0"
+
+def format_date(timestamp) -> str:
+    """Convert Unix timestamp to MM/DD/YYYY format"""
+    try:
+        if timestamp and str(timestamp) != '0':
+            from datetime import datetime
+            ts_int = int(timestamp)
+            # Validate timestamp is reasonable (after year 2000, before year 2100)
+            if ts_int > 946684800 and ts_int < 4102444800:
+                dt = datetime.fromtimestamp(ts_int)
+                month = str(dt.month)
+                day = str(dt.day)
+                year = str(dt.year)
+                return f"{month}/{day}/{year}"
+    except Exception:
+        pass
+    return ""
+
+async def fetch_stats(api: TikTokApi, url: str, max_retries: int = 2, session_index: Optional[int] = None):
+    # Pin the request to one session when called from a session pool
+    session_kwargs = {"session_index": session_index} if session_index is not None else {}
     match = VID_RE.search(urlparse(url).path)
     if not match:
         return (url, "", "", "", "", "no_video_id")
     video_id = match.group(1)
 
-    def to_int_str(value):
-        try:
-            if value is None or value == "":
-                return "0"
-            if isinstance(value, str):
-                cleaned = value.replace(",", "")
-                return str(int(float(cleaned))) if "." in cleaned else str(int(cleaned))
-            return str(int(value))
-        except Exception:
-            return "0"
-    
-    def format_date(timestamp):
-        """Convert Unix timestamp to MM/DD/YYYY format"""
-        try:
-            if timestamp and str(timestamp) != '0':
-                from datetime import datetime
-                ts_int = int(timestamp)
-                # Validate timestamp is reasonable (after year 2000, before year 2100)
-                if ts_int > 946684800 and ts_int < 4102444800:
-                    dt = datetime.fromtimestamp(ts_int)
-                    month = str(dt.month)
-                    day = str(dt.day)
-                    year = str(dt.year)
-                    return f"{month}/{day}/{year}"
-        except Exception:
-            pass
-        return ""
-
     def err_status(e: Exception) -> str:
         msg = str(e).replace(",", ";").replace("\n", " ").strip()
         return f"{type(e).__name__}:{msg}" if msg else type(e).__name__
@@ -175,7 +202,7 @@ async def fetch_stats(api: TikTokApi, url: str, max_retries: int = 2):
     for attempt in range(max_retries + 1):
         try:
             # Strategy 1: Fetch by video ID (more reliable for some videos)
-            info = await api.video(id=video_id).info()
+            info = await api.video(id=video_id).info(**session_kwargs)
             
             # Validate that we got useful data
             if isinstance(info, dict) and "stats" in info:
@@ -197,7 +224,7 @@ async def fetch_stats(api: TikTokApi, url: str, max_retries: int = 2):
         except Exception as e_id:
             # If ID fetch fails, try URL-based fetch
             try:
-                info = await api.video(url=url).info()
+                info = await api.video(url=url).info(**session_kwargs)
                 
                 # Validate that we got useful data
                 if isinstance(info, dict) and "stats" in info:
@@ -0,0 +1,156 @@
+"""
+Progress event bus for sheet update jobs
+Fetch stages and the sheet writer publish structured progress for the current job; the
+bus keeps the latest state per phase/platform and fans it out to subscribers, coalescing
+bursts so per-URL updates arrive at most a few times per second
+"""
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+# Minimum seconds between batches sent to one subscriber
+PROGRESS_INTERVAL = float(os.getenv("PROGRESS_INTERVAL", "0.5"))
+
+# Log lines buffered per subscriber between batches (older ones are dropped)
+MAX_LOG_LINES = int(os.getenv("PROGRESS_MAX_LOG_LINES", "50"))
+
+# Job whose progress the current task (or worker thread started from it) is reporting
+current_job: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("progress_job", default=None)
+
+
+class Subscription:
+    """One subscriber's view of a job: latest event per key plus buffered log lines."""
+
+    def __init__(self, bus: "ProgressBus", job_id: str):
+        self.bus = bus
+        self.job_id = job_id
+        self._pending: Dict[str, dict] = {}
+        self._logs: List[str] = []
+        self._wakeup = asyncio.Event()
+
+    def _offer(self, key: str, event: dict) -> None:
+        if key == "log":
+            self._logs.append(event["message"])
+            del self._logs[:-MAX_LOG_LINES]
+        else:
+            self._pending[key] = event
+        self._wakeup.set()
+
+    async def next_batch(self) -> List[dict]:
+        """Wait for new events and return them, coalesced (one per phase/platform)."""
+        await self._wakeup.wait()
+        # Let a burst accumulate so it goes out as one batch
+        await asyncio.sleep(PROGRESS_INTERVAL)
+        self._wakeup.clear()
+        batch = list(self._pending.values())
+        if self._logs:
+            batch.append({"type": "log", "job_id": self.job_id, "lines": self._logs})
+        self._pending, self._logs = {}, []
+        return batch
+
+    def close(self) -> None:
+        self.bus._unsubscribe(self)
+
+
+class ProgressBus:
+    """
+    Per-job publish/subscribe hub.
+
+    publish() may be called from any thread; delivery to subscribers happens on the
+    event loop the bus was bound to. The latest event per key is kept per job so late
+    subscribers start from the current state.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subs: Dict[str, Set[Subscription]] = {}
+        self._latest: Dict[str, Dict[str, dict]] = {}
+        # job id -> progress key -> (start time, last done count) for ETAs
+        self._started: Dict[str, Dict[str, Tuple[float, int]]] = {}
+        self._lock = threading.Lock()
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Attach the bus to the server's event loop (enables publishing)."""
+        self._loop = loop
+
+    def subscribe(self, job_id: str) -> Subscription:
+        sub = Subscription(self, job_id)
+        self._subs.setdefault(job_id, set()).add(sub)
+        for key, event in self._latest.get(job_id, {}).items():
+            sub._offer(key, event)
+        return sub
+
+    def _unsubscribe(self, sub: Subscription) -> None:
+        subs = self._subs.get(sub.job_id)
+        if subs is not None:
+            subs.discard(sub)
+            if not subs:
+                del self._subs[sub.job_id]
+
+    def forget(self, job_id: str) -> None:
+        """Drop a finished job's retained state."""
+        with self._lock:
+            self._latest.pop(job_id, None)
+            self._started.pop(job_id, None)
+
+    def publish(self, key: str, event: dict, job_id: Optional[str] = None) -> None:
+        """Publish an event for a job (default: the job in the current context)."""
+        job_id = job_id or current_job.get()
+        if not job_id or self._loop is None or self._loop.is_closed():
+            return
+        event = dict(event, job_id=job_id, ts=time.time())
+        if key != "log":
+            with self._lock:
+                self._latest.setdefault(job_id, {})[key] = event
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._deliver(job_id, key, event)
+        else:
+            self._loop.call_soon_threadsafe(self._deliver, job_id, key, event)
+
+    def _deliver(self, job_id: str, key: str, event: dict) -> None:
+        for sub in list(self._subs.get(job_id, ())):
+            sub._offer(key, event)
+
+    def report(self, phase: str, done: int, total: int = 0, platform: str = "",
+               ok: Optional[int] = None, failed: Optional[int] = None) -> None:
+        """
+        Publish progress of one phase ("read", "resolve", "fetch", "write"), with an ETA
+        extrapolated from the rate since the phase started. A phase that counts from 0
+        again (the next chunk of a streamed run) starts a new measurement.
+        """
+        job_id = current_job.get()
+        if not job_id or self._loop is None:
+            return
+        key = f"{phase}:{platform}" if platform else phase
+        now = time.time()
+        with self._lock:
+            phases = self._started.setdefault(job_id, {})
+            started, last_done = phases.get(key, (now, 0))
+            if done == 0 or done < last_done:
+                started = now
+            phases[key] = (started, done)
+        eta = None
+        if total and 0 < done < total:
+            eta = round((now - started) / done * (total - done), 1)
+        elif total and done >= total:
+            eta = 0
+        event = {"type": "progress", "phase": phase, "platform": platform,
+                 "done": done, "total": total, "eta_seconds": eta}
+        if ok is not None:
+            event["ok"] = ok
+        if failed is not None:
+            event["failed"] = failed
+        self.publish(key, event, job_id)
+
+    def log(self, message: str) -> None:
+        self.publish("log", {"type": "log", "message": message})
+
+
+bus = ProgressBus()
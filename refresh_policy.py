@@ -0,0 +1,129 @@
+"""
+Age- and velocity-aware refresh scheduling
+Decides when a cached post is due for another fetch: fresh posts are refetched often,
+month-old posts rarely, and posts still gaining views quickly are pulled forward
+"""
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import stats_cache
+
+# Set to 0 to refetch every entry once its platform TTL has passed
+ENABLED = os.getenv("REFRESH_POLICY", "1").lower() not in ("0", "false", "no")
+
+# Post age (days) -> refresh interval (hours), as "days:hours" pairs in ascending order
+DEFAULT_AGE_BUCKETS = "2:1,7:6,30:24,90:72"
+
+# Interval for posts older than the last bucket, and the overall cap (hours)
+MAX_INTERVAL_HOURS = float(os.getenv("REFRESH_MAX_INTERVAL_HOURS", "168"))
+
+# Views per hour at which a post counts as hot and is refreshed twice as often
+HOT_VELOCITY = float(os.getenv("REFRESH_HOT_VELOCITY", "1000"))
+
+# Relative view growth between two fetches below which a post counts as stalled
+# and its interval is doubled
+STALL_GROWTH = float(os.getenv("REFRESH_STALL_GROWTH", "0.01"))
+
+
+def _parse_buckets(spec: str) -> List[Tuple[float, float]]:
+    buckets = []
+    for part in spec.split(","):
+        if ":" not in part:
+            continue
+        days, hours = part.split(":", 1)
+        try:
+            buckets.append((float(days), float(hours)))
+        except ValueError:
+            continue
+    return sorted(buckets)
+
+
+AGE_BUCKETS = _parse_buckets(os.getenv("REFRESH_AGE_BUCKETS", DEFAULT_AGE_BUCKETS))
+
+
+def _parse_post_date(value: str) -> Optional[float]:
+    """Epoch seconds for an M/D/YYYY post date (the format both TikTok and Instagram produce)."""
+    try:
+        return datetime.strptime(value.strip(), "%m/%d/%Y").timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+def _to_int(value) -> Optional[int]:
+    try:
+        return int(str(value).replace(",", "").strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def view_velocity(entry: dict) -> Optional[float]:
+    """Views gained per hour between the last two fetches, or None without history."""
+    views, prev_views = _to_int(entry.get("views")), _to_int(entry.get("prev_views"))
+    fetched_at, prev_fetched_at = entry.get("fetched_at"), entry.get("prev_fetched_at")
+    if views is None or prev_views is None or not prev_fetched_at or fetched_at <= prev_fetched_at:
+        return None
+    return max(0, views - prev_views) / ((fetched_at - prev_fetched_at) / 3600)
+
+
+def refresh_interval(platform: str, entry: dict) -> float:
+    """
+    Seconds after its fetch that a cached entry becomes due again.
+
+    Args:
+        platform: Platform identifier (see url_index)
+        entry: Cache entry from stats_cache
+
+    Returns:
+        Interval in seconds; never shorter than the platform's cache TTL
+    """
+    ttl = stats_cache.TTLS.get(platform, 0)
+    posted_at = _parse_post_date(entry.get("date") or "")
+    if not ENABLED or entry.get("status") != "ok" or posted_at is None:
+        # Policy off, or no post date (YouTube, X, not-found answers): fall back to the plain TTL
+        return ttl
+
+    age_days = max(0.0, (entry["fetched_at"] - posted_at) / 86400)
+    hours = MAX_INTERVAL_HOURS
+    for max_age, bucket_hours in AGE_BUCKETS:
+        if age_days < max_age:
+            hours = bucket_hours
+            break
+
+    velocity = view_velocity(entry)
+    if velocity is not None:
+        prev_views = _to_int(entry.get("prev_views")) or 0
+        views = _to_int(entry.get("views")) or 0
+        if velocity >= HOT_VELOCITY:
+            hours /= 2
+        elif views - prev_views <= prev_views * STALL_GROWTH:
+            hours *= 2
+
+    return max(ttl, min(hours, MAX_INTERVAL_HOURS) * 3600)
+
+
+def next_due(platform: str, entry: dict) -> float:
+    """Epoch seconds at which a cached entry should be fetched again."""
+    return entry["fetched_at"] + refresh_interval(platform, entry)
+
+
+def not_due(platform: str, entries: Dict[str, dict], now: Optional[float] = None) -> Dict[str, dict]:
+    """
+    Filter cache entries down to the ones that do not need fetching yet.
+
+    Args:
+        platform: Platform identifier (see url_index)
+        entries: Key -> cache entry, as returned by StatsCache.get_many
+        now: Reference time (default: time.time())
+
+    Returns:
+        The subset of entries that can be served from the cache
+    """
+    now = time.time() if now is None else now
+    if stats_cache.TTLS.get(platform, 0) <= 0:
+        return {}
+    return {
+        k: e for k, e in entries.items()
+        if e["status"] in stats_cache.CACHEABLE_STATUSES and now < next_due(platform, e)
+    }
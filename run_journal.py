@@ -0,0 +1,133 @@
+"""
+On-disk fetch journal for resumable sheet runs
+Every fetched result is appended to a JSONL file keyed by spreadsheet/worksheet/row range,
+so a run that dies part-way can be resumed without refetching what it already got
+"""
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+CONFIG_DIR = Path(os.getenv("TOOL_CONFIG_DIR", str(Path.home() / ".tool_google")))
+JOURNAL_DIR = Path(os.getenv("RUN_JOURNAL_DIR", str(CONFIG_DIR / "journals")))
+
+# Journals older than this are ignored on resume (hours, 0 = no limit)
+MAX_AGE_HOURS = float(os.getenv("RUN_JOURNAL_MAX_AGE_HOURS", "24"))
+
+
+def journal_id(spreadsheet: str, worksheet: str, start_row: Optional[int], end_row: Optional[int]) -> str:
+    """Stable identifier for a run over one spreadsheet/worksheet/row range."""
+    raw = f"{spreadsheet}\n{worksheet}\n{start_row or ''}\n{end_row or ''}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+class RunJournal:
+    """
+    Append-only record of the stats fetched during one run.
+
+    Each line is {"platform": ..., "key": ..., "stats": {...}, "t": epoch seconds}.
+    Appends are thread-safe and flushed immediately so they survive a crash.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._fh = None
+        # Fresh run not yet opened: the previous journal stays until the first result arrives
+        self._replace_pending = False
+        self.recorded = 0
+        # platform -> key -> epoch seconds the result was fetched, filled by load()
+        self.loaded_times: Dict[str, Dict[str, float]] = {}
+
+    @classmethod
+    def for_run(cls, spreadsheet: str, worksheet: str, start_row: Optional[int] = None,
+                end_row: Optional[int] = None) -> "RunJournal":
+        return cls(JOURNAL_DIR / f"{journal_id(spreadsheet, worksheet, start_row, end_row)}.jsonl")
+
+    def load(self) -> Dict[str, Dict[str, Dict[str, str]]]:
+        """
+        Read back a previous run's results.
+
+        When each result was fetched is kept in loaded_times.
+
+        Returns:
+            platform -> canonical key -> stats dict (empty if there is no usable journal)
+        """
+        replay: Dict[str, Dict[str, Dict[str, str]]] = {}
+        self.loaded_times = {}
+        try:
+            if MAX_AGE_HOURS > 0 and time.time() - self.path.stat().st_mtime > MAX_AGE_HOURS * 3600:
+                print(f"Ignoring journal older than {MAX_AGE_HOURS:.0f}h: {self.path}", file=sys.stderr)
+                return replay
+            with self.path.open("r", encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        rec = json.loads(line)
+                        replay.setdefault(rec["platform"], {})[rec["key"]] = rec["stats"]
+                        self.loaded_times.setdefault(rec["platform"], {})[rec["key"]] = float(rec["t"])
+                    except (ValueError, KeyError, TypeError):
+                        continue  # Partial last line from a crash
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Warning: Failed to read run journal {self.path}: {e}", file=sys.stderr)
+        return replay
+
+    def start(self, resume: bool) -> None:
+        """
+        Open the journal for appending.
+
+        A fresh (non-resumed) run starts from an empty file, but only once it records its
+        first result, so a run that fails before fetching anything leaves the previous
+        run's journal to resume from.
+        """
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if resume:
+                self._fh = self.path.open("a", encoding="utf-8")
+            else:
+                self._replace_pending = True
+
+    def record_many(self, platform: str, stats_by_key: Dict[str, Dict[str, str]]) -> None:
+        """Append successful results for one platform."""
+        if not stats_by_key:
+            return
+        now = time.time()
+        lines = "".join(
+            json.dumps({"platform": platform, "key": key, "stats": stats, "t": now}) + "\n"
+            for key, stats in stats_by_key.items()
+        )
+        with self._lock:
+            try:
+                if self._replace_pending:
+                    self._fh = self.path.open("w", encoding="utf-8")
+                    self._replace_pending = False
+                if self._fh is None:
+                    return
+                self._fh.write(lines)
+                self._fh.flush()
+                self.recorded += len(stats_by_key)
+            except Exception as e:
+                print(f"Warning: Failed to write run journal: {e}", file=sys.stderr)
+
+    def record(self, platform: str, key: str, stats: Dict[str, str]) -> None:
+        self.record_many(platform, {key: stats})
+
+    def close(self) -> None:
+        with self._lock:
+            self._replace_pending = False
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+    def discard(self) -> None:
+        """Close and delete the journal (the run finished, nothing left to resume)."""
+        self.close()
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,246 @@
+"""
+Google Sheets I/O
+Reads only the columns and rows a run needs, reduces its column updates to the cells
+that actually changed, sends them in one values:batchUpdate request (split only when it
+would exceed the payload limit), and retries quota (429) and transient errors
+"""
+import os
+import random
+import re
+import sys
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from gspread.exceptions import APIError
+
+# Cells sent per values:batchUpdate request; larger writes are split into several requests
+MAX_CELLS_PER_REQUEST = int(os.getenv("SHEETS_MAX_CELLS_PER_REQUEST", "50000"))
+
+# Retries for 429 (per-minute quota) and 5xx responses
+MAX_RETRIES = int(os.getenv("SHEETS_MAX_RETRIES", "5"))
+
+# Cap on a single backoff wait in seconds (the write quota refills every minute)
+MAX_BACKOFF = float(os.getenv("SHEETS_MAX_BACKOFF", "64"))
+
+_RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CellBlock(NamedTuple):
+    """A rectangle of values whose top-left cell is (row, col), both 1-based."""
+    row: int
+    col: int
+    values: List[List[Any]]
+
+    @property
+    def num_cells(self) -> int:
+        return sum(len(r) for r in self.values)
+
+    def a1(self) -> str:
+        width = max((len(r) for r in self.values), default=1)
+        end_row = self.row + len(self.values) - 1
+        end_col = self.col + width - 1
+        return f"{col_letter(self.col)}{self.row}:{col_letter(end_col)}{end_row}"
+
+
+def col_letter(col_index: int) -> str:
+    """1-based column index -> A1 column letters (1 -> A, 27 -> AA)."""
+    s = ""
+    n = col_index
+    while n > 0:
+        n, r = divmod(n - 1, 26)
+        s = chr(65 + r) + s
+    return s
+
+
+def column_block(col: int, start_row: int, values: List[Any]) -> CellBlock:
+    """A single-column block from a flat list of values."""
+    return CellBlock(start_row, col, [[v] for v in values])
+
+
+def _cell_text(value: Any) -> str:
+    """Unformatted cell value as the string this tool would write for it."""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def read_columns(ws, cols: List[int], first_row: int, last_row: Optional[int] = None) -> List[List[str]]:
+    """
+    Read a subset of columns over a row range with one values:batchGet request.
+
+    Numbers are read unformatted ("12345", not "12,345") so they compare equal to the
+    plain values written back and unchanged stats aren't rewritten on every run; dates
+    and times still come back as displayed.
+
+    Args:
+        ws: gspread Worksheet
+        cols: 1-based column indexes to read
+        first_row: First sheet row to read
+        last_row: Last sheet row to read (default: up to the last non-empty row)
+
+    Returns:
+        Rows starting at first_row, each a list as wide as the right-most requested
+        column with only the requested columns filled in. Trailing empty rows are dropped.
+    """
+    cols = sorted(set(c for c in cols if c))
+    if not cols or (last_row is not None and last_row < first_row):
+        return []
+    end = str(last_row) if last_row is not None else ""
+    ranges = [f"{col_letter(c)}{first_row}:{col_letter(c)}{end}" for c in cols]
+    results = call_with_retry(ws.batch_get, ranges, value_render_option="UNFORMATTED_VALUE",
+                              date_time_render_option="FORMATTED_STRING")
+
+    num_rows = max((len(r) for r in results), default=0)
+    width = cols[-1]
+    rows = [[""] * width for _ in range(num_rows)]
+    for col, column_values in zip(cols, results):
+        for i, cell in enumerate(column_values):
+            if cell and cell[0] != "":
+                rows[i][col - 1] = _cell_text(cell[0])
+    return rows
+
+
+def _changed_runs(old: List[Any], new: List[Any]) -> List[Tuple[int, int]]:
+    """Half-open [start, end) index runs where new differs from old."""
+    runs: List[Tuple[int, int]] = []
+    run_start = -1
+    for i, value in enumerate(new):
+        before = old[i] if i < len(old) else ""
+        changed = str(value if value is not None else "") != str(before if before is not None else "")
+        if changed and run_start < 0:
+            run_start = i
+        elif not changed and run_start >= 0:
+            runs.append((run_start, i))
+            run_start = -1
+    if run_start >= 0:
+        runs.append((run_start, len(new)))
+    return runs
+
+
+def changed_blocks(columns: List[Tuple[int, List[Any], List[Any]]], start_row: int) -> List[CellBlock]:
+    """
+    Blocks covering only the cells whose value changed.
+
+    Consecutive changed cells in a column become one range, and ranges spanning the same
+    rows in adjacent columns are merged into a single rectangle.
+
+    Args:
+        columns: (1-based column, existing values, new values) per column, values aligned
+            with rows start_row, start_row + 1, ...
+        start_row: Sheet row of the first value
+
+    Returns:
+        Minimal list of CellBlocks to write (empty if nothing changed)
+    """
+    # (first row index, end row index) -> open rectangle [first col, last col, new values per col]
+    open_rects: Dict[Tuple[int, int], list] = {}
+    rects: List[Tuple[Tuple[int, int], list]] = []
+    for col, old, new in sorted((c for c in columns if c[0]), key=lambda c: c[0]):
+        for run in _changed_runs(old, new):
+            rect = open_rects.get(run)
+            if rect is not None and rect[1] == col - 1:
+                rect[1] = col
+                rect[2].append(new[run[0]:run[1]])
+            else:
+                rect = [col, col, [new[run[0]:run[1]]]]
+                open_rects[run] = rect
+                rects.append((run, rect))
+
+    blocks = []
+    for (first, _end), (first_col, _last_col, col_values) in rects:
+        rows = [list(cells) for cells in zip(*col_values)]
+        blocks.append(CellBlock(start_row + first, first_col, rows))
+    return blocks
+
+
+def _split_block(block: CellBlock, max_cells: int) -> List[CellBlock]:
+    """Split a block by rows so each piece has at most max_cells cells."""
+    width = max((len(r) for r in block.values), default=1) or 1
+    rows_per_piece = max(1, max_cells // width)
+    return [
+        CellBlock(block.row + i, block.col, block.values[i:i + rows_per_piece])
+        for i in range(0, len(block.values), rows_per_piece)
+    ]
+
+
+def plan_requests(blocks: List[CellBlock], max_cells: int = 0) -> List[List[CellBlock]]:
+    """
+    Group blocks into values:batchUpdate requests of at most max_cells cells each.
+
+    Args:
+        blocks: Blocks to write
+        max_cells: Cell cap per request (default: SHEETS_MAX_CELLS_PER_REQUEST)
+
+    Returns:
+        List of requests, each a list of blocks (one request whenever everything fits)
+    """
+    max_cells = max(1, max_cells or MAX_CELLS_PER_REQUEST)
+    requests: List[List[CellBlock]] = []
+    current: List[CellBlock] = []
+    current_cells = 0
+    for block in blocks:
+        if not block.values:
+            continue
+        pieces = _split_block(block, max_cells) if block.num_cells > max_cells else [block]
+        for piece in pieces:
+            if current and current_cells + piece.num_cells > max_cells:
+                requests.append(current)
+                current, current_cells = [], 0
+            current.append(piece)
+            current_cells += piece.num_cells
+    if current:
+        requests.append(current)
+    return requests
+
+
+def _status_code(error: APIError) -> int:
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", 0) or getattr(error, "code", 0) or 0
+
+
+def _retry_after(error: APIError) -> float:
+    response = getattr(error, "response", None)
+    value = (getattr(response, "headers", None) or {}).get("Retry-After", "")
+    return float(value) if re.fullmatch(r"\d+(\.\d+)?", str(value).strip()) else 0.0
+
+
+def call_with_retry(fn, *args, max_retries: int = -1, **kwargs):
+    """
+    Call a gspread method, retrying on 429/5xx with exponential backoff and jitter.
+    Honours Retry-After when the API sends it. Other errors are raised immediately.
+    """
+    retries = MAX_RETRIES if max_retries < 0 else max_retries
+    for attempt in range(retries + 1):
+        try:
+            return fn(*args, **kwargs)
+        except APIError as e:
+            status = _status_code(e)
+            if status not in _RETRYABLE_STATUSES or attempt >= retries:
+                raise
+            wait = _retry_after(e) or min(MAX_BACKOFF, 2 ** attempt + random.uniform(0, 1))
+            print(f"Sheets API returned {status}, retrying in {wait:.1f}s "
+                  f"(attempt {attempt + 1}/{retries})...", file=sys.stderr, flush=True)
+            time.sleep(wait)
+
+
+def batch_write(ws, blocks: List[CellBlock], value_input_option: str = "USER_ENTERED",
+                max_cells: int = 0) -> int:
+    """
+    Write all blocks with as few values:batchUpdate calls as the payload limit allows.
+
+    Args:
+        ws: gspread Worksheet
+        blocks: Blocks to write
+        value_input_option: How Sheets interprets the values (default: USER_ENTERED)
+        max_cells: Cell cap per request (default: SHEETS_MAX_CELLS_PER_REQUEST)
+
+    Returns:
+        Number of API requests made
+    """
+    requests = plan_requests(blocks, max_cells)
+    for request in requests:
+        data = [{"range": block.a1(), "values": block.values} for block in request]
+        call_with_retry(ws.batch_update, data, value_input_option=value_input_option)
+    return len(requests)
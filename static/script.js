@@ -519,6 +519,85 @@ async function updateSheetStatus(sheetId, status, lastUpdated = new Date()) {
     }
 }
 
+// Poll a background update job until it finishes. Transient network errors are retried,
+// so a dropped connection or proxy timeout no longer loses track of the job.
+const JOB_POLL_INTERVAL_MS = 5000;
+
+async function waitForJob(jobId) {
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+        try {
+            // Fetch a fresh ID token each time; long jobs can outlive a token
+            const idToken = await window.firebase.getIdToken();
+            const response = await fetch(`/api/jobs/${jobId}`, {
+                headers: { 'Authorization': `Bearer ${idToken}` }
+            });
+            if (response.status === 404) {
+                throw new Error('Update job was lost (the server may have restarted). Run it again to continue where it stopped.');
+            }
+            if (!response.ok) {
+                continue;  // 502/503/504 from the proxy: keep polling
+            }
+            const job = await response.json();
+            if (job.state === 'succeeded' || job.state === 'failed') {
+                return job;
+            }
+        } catch (error) {
+            if (error.message && error.message.includes('Update job was lost')) {
+                throw error;
+            }
+            console.warn('Job poll failed, retrying:', error);
+        }
+    }
+}
+
+// Show live progress for a job on its Run button. Completion is still decided by
+// waitForJob, so if the socket can't connect the button just keeps saying "Running...".
+function formatProgress(event) {
+    const phase = event.platform ? `${event.phase} ${event.platform}` : event.phase;
+    let text = event.total ? `${phase} ${event.done}/${event.total}` : `${phase} ${event.done}`;
+    if (event.eta_seconds) {
+        text += ` · ${Math.ceil(event.eta_seconds / 60)}m left`;
+    }
+    return text;
+}
+
+async function watchJobProgress(jobId, sheetId) {
+    const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+    let socket;
+    try {
+        const idToken = await window.firebase.getIdToken();
+        socket = new WebSocket(`${protocol}//${window.location.host}/ws`);
+        socket.onopen = () => {
+            socket.send(JSON.stringify({ action: 'subscribe', job_id: jobId, token: idToken }));
+        };
+        socket.onmessage = (message) => {
+            let data;
+            try {
+                data = JSON.parse(message.data);
+            } catch {
+                return;
+            }
+            if (data.type !== 'batch') return;
+            const latest = data.events.filter(e => e.type === 'progress').pop();
+            // The table is re-rendered while the job runs, so look the button up each time
+            const btn = document.getElementById(`run-${sheetId}`);
+            if (latest && btn) {
+                btn.textContent = formatProgress(latest);
+            }
+            data.events.filter(e => e.type === 'log').forEach(e => e.lines.forEach(line => console.log(line)));
+        };
+        socket.onerror = () => console.warn('Progress stream unavailable, waiting for the job to finish');
+    } catch (error) {
+        console.warn('Could not open progress stream:', error);
+    }
+    return () => {
+        if (socket && socket.readyState <= WebSocket.OPEN) {
+            socket.close();
+        }
+    };
+}
+
 async function runUpdate(sheetId) {
     const btn = document.getElementById(`run-${sheetId}`);
     if (!btn || btn.disabled) return;
@@ -543,7 +622,7 @@ async function runUpdate(sheetId) {
         await updateSheetStatus(sheetId, 'pending');
         await loadSheets(); // Refresh to show PENDING badge
         
-        showToast(`⏳ Processing ${sheet.name}... This may take several minutes for large sheets. The update will continue even if your browser times out.`, 'info');
+        showToast(`⏳ Processing ${sheet.name}... This may take several minutes for large sheets. The update runs on the server, so you can keep this page open or come back later.`, 'info');
         
         // Get ID token for API auth
         const idToken = await window.firebase.getIdToken();
@@ -552,78 +631,53 @@ async function runUpdate(sheetId) {
         formData.append('spreadsheet', sheet.spreadsheet_url);
         formData.append('worksheet', sheet.worksheet_name);
         formData.append('override', 'true');
+        // A previous run that failed or never reported back (timeout, server restart)
+        // journaled what it fetched; pick up from there. The server starts fresh if there
+        // is no recent journal.
+        if (sheet.status === 'error' || sheet.status === 'pending') {
+            formData.append('resume', 'true');
+        }
         
-        // Create AbortController with a very long timeout (30 minutes)
-        const controller = new AbortController();
-        const timeoutId = setTimeout(() => controller.abort(), 30 * 60 * 1000);
+        // Queue the update; the server runs it as a background job and returns its id
+        const response = await fetch('/api/update-sheets', {
+            method: 'POST',
+            headers: {
+                'Authorization': `Bearer ${idToken}`
+            },
+            body: formData
+        });
         
+        let data = {};
         try {
-            const response = await fetch('/api/update-sheets', {
-                method: 'POST',
-                headers: {
-                    'Authorization': `Bearer ${idToken}`
-                },
-                body: formData,
-                signal: controller.signal
-            });
-            
-            clearTimeout(timeoutId);
-            
-            // Handle 502 Bad Gateway (server crashed) or 504 Gateway Timeout
-            if (response.status === 502 || response.status === 504) {
-                const isTimeout = response.status === 504;
-                const message = isTimeout 
-                    ? `⏱️ Update timed out for ${sheet.name}. For large sheets (1000+ URLs), try processing in smaller batches using row ranges. Partial data may have been updated.`
-                    : `⚠️ Server became overloaded processing ${sheet.name}. For large sheets (1000+ URLs), try processing in batches using row ranges. Partial data may have been updated.`;
-                
-                showToast(message, 'error');
-                await updateSheetStatus(sheetId, 'error', new Date());
-                await loadSheets();
-                return;
-            }
-            
-            // Handle other non-200 status codes
-            if (!response.ok && response.status !== 200) {
-                let errorMessage = `Server error (${response.status})`;
-                try {
-                    const errorData = await response.json();
-                    errorMessage = errorData.message || errorMessage;
-                } catch {
-                    // If can't parse JSON, use default message
-                }
-                throw new Error(errorMessage);
-            }
-            
-            const data = await response.json();
-            
-            if (data.success) {
-                // Set status to COMPLETE with timestamp
-                await updateSheetStatus(sheetId, 'complete', new Date());
-                showToast(`✅ ${sheet.name} updated successfully!`, 'success');
-            } else {
-                // Set status to ERROR
-                await updateSheetStatus(sheetId, 'error', new Date());
-                throw new Error(data.message || 'Update failed');
-            }
-        } catch (fetchError) {
-            clearTimeout(timeoutId);
-            
-            // Check if it's a network timeout/protocol error
-            if (fetchError.name === 'AbortError' || 
-                fetchError.message.includes('Failed to fetch') || 
-                fetchError.message.includes('NetworkError')) {
-                
-                // The connection timed out, but the server is still processing
-                showToast(`⚠️ Connection timed out, but ${sheet.name} is still being processed on the server. Check back in a few minutes and refresh the page.`, 'info');
-                
-                // Keep status as PENDING instead of ERROR
-                await updateSheetStatus(sheetId, 'pending');
-                await loadSheets();
-                return; // Don't throw error
-            }
-            
-            // For other errors, rethrow
-            throw fetchError;
+            data = await response.json();
+        } catch {
+            // Non-JSON error page from a proxy
+        }
+        if (response.status === 409 && data.job_id) {
+            // This sheet range is already updating; follow that job instead
+            console.log('Update already in progress, following job', data.job_id);
+        } else if (!response.ok || !data.success || !data.job_id) {
+            throw new Error(data.message || data.detail || `Server error (${response.status})`);
+        }
+        
+        const stopProgress = await watchJobProgress(data.job_id, sheetId);
+        let job;
+        try {
+            job = await waitForJob(data.job_id);
+        } finally {
+            stopProgress();
+        }
+        
+        if (job.state === 'succeeded') {
+            // Set status to COMPLETE with timestamp
+            await updateSheetStatus(sheetId, 'complete', new Date());
+            const counts = job.counts || {};
+            const detail = counts.urls ? ` (${counts.rows_changed || 0}/${counts.urls} rows changed)` : '';
+            showToast(`✅ ${sheet.name} updated successfully!${detail}`, 'success');
+        } else {
+            // Set status to ERROR
+            await updateSheetStatus(sheetId, 'error', new Date());
+            throw new Error(job.error || 'Update failed');
         }
         
     } catch (error) {
@@ -0,0 +1,174 @@
+"""
+Persistent per-URL stats cache
+SQLite store plus an in-process LRU, keyed by canonical URL, with per-platform TTLs
+so recently fetched posts (or the same post in several users' sheets) aren't refetched
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+CONFIG_DIR = Path(os.getenv("TOOL_CONFIG_DIR", str(Path.home() / ".tool_google")))
+CACHE_DB = Path(os.getenv("STATS_CACHE_DB", str(CONFIG_DIR / "stats_cache.sqlite3")))
+
+# Entries kept in memory in front of SQLite
+LRU_SIZE = int(os.getenv("STATS_CACHE_LRU_SIZE", "20000"))
+
+# Seconds a fetched result stays fresh, per platform (0 disables caching for that platform)
+TTLS = {
+    "tiktok": float(os.getenv("STATS_TTL_TIKTOK", "3600")),
+    "youtube": float(os.getenv("STATS_TTL_YOUTUBE", "3600")),
+    "twitter": float(os.getenv("STATS_TTL_TWITTER", "3600")),
+    "instagram": float(os.getenv("STATS_TTL_INSTAGRAM", "21600")),  # Apify runs are slow and paid
+}
+
+# Fields stored for each URL (same keys as the stats dicts built in integrations)
+STAT_FIELDS = ("views", "likes", "comments", "date", "username")
+
+# Statuses worth caching: real stats, and definitive "this post is gone" answers
+CACHEABLE_STATUSES = {"ok", "not_found"}
+
+_SQLITE_CHUNK = 500
+
+
+class StatsCache:
+    """
+    Stats store keyed by canonical URL.
+
+    Each entry holds the stat fields plus platform, status, fetched_at (epoch seconds) and
+    the view count from the fetch before (prev_views/prev_fetched_at).
+    Thread-safe; reads go through an in-process LRU before hitting SQLite.
+    """
+
+    def __init__(self, path: Path = CACHE_DB, lru_size: int = LRU_SIZE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._lru: "OrderedDict[str, dict]" = OrderedDict()
+        self._lru_size = max(0, lru_size)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS stats (
+                    key TEXT PRIMARY KEY,
+                    platform TEXT NOT NULL,
+                    views TEXT, likes TEXT, comments TEXT, date TEXT, username TEXT,
+                    status TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    prev_views TEXT,
+                    prev_fetched_at REAL
+                )
+                """
+            )
+            # Caches created before view history was tracked
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(stats)")}
+            for column, kind in (("prev_views", "TEXT"), ("prev_fetched_at", "REAL")):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE stats ADD COLUMN {column} {kind}")
+            self._conn.commit()
+
+    def _remember(self, key: str, entry: dict) -> None:
+        if not self._lru_size:
+            return
+        self._lru[key] = entry
+        self._lru.move_to_end(key)
+        while len(self._lru) > self._lru_size:
+            self._lru.popitem(last=False)
+
+    def _lookup(self, keys: Iterable[str]) -> Dict[str, dict]:
+        """get_many without taking the lock (caller holds it)."""
+        found: Dict[str, dict] = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            entry = self._lru.get(key)
+            if entry is not None:
+                self._lru.move_to_end(key)
+                found[key] = entry
+            else:
+                missing.append(key)
+        for i in range(0, len(missing), _SQLITE_CHUNK):
+            chunk = missing[i:i + _SQLITE_CHUNK]
+            rows = self._conn.execute(
+                f"SELECT key, platform, {', '.join(STAT_FIELDS)}, status, fetched_at, prev_views, prev_fetched_at "
+                f"FROM stats WHERE key IN ({','.join('?' * len(chunk))})",
+                chunk,
+            ).fetchall()
+            for row in rows:
+                n = len(STAT_FIELDS)
+                entry = {"platform": row[1], "status": row[n + 2], "fetched_at": row[n + 3],
+                         "prev_views": row[n + 4] or "", "prev_fetched_at": row[n + 5]}
+                entry.update({f: (v or "") for f, v in zip(STAT_FIELDS, row[2:n + 2])})
+                found[row[0]] = entry
+                self._remember(row[0], entry)
+        return found
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, dict]:
+        """Return stored entries (fresh or not) for the given keys."""
+        with self._lock:
+            return self._lookup(keys)
+
+    def put_many(self, platform: str, entries: Dict[str, dict], status: str = "ok",
+                 fetched_at: Optional[float] = None) -> None:
+        """
+        Store stats dicts (key -> {"views": ..., ...}) fetched for one platform.
+
+        For ok results the previously stored view count and fetch time are kept as
+        prev_views/prev_fetched_at, so callers can work out view velocity. With an
+        explicit (past) fetched_at, keys already stored with a later fetch are left alone.
+        """
+        if not entries:
+            return
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        rows = []
+        with self._lock:
+            previous = self._lookup(entries)
+            for key, stats in entries.items():
+                old = previous.get(key)
+                if old and old["fetched_at"] > fetched_at:
+                    continue
+                entry = {"platform": platform, "status": status, "fetched_at": fetched_at,
+                         "prev_views": "", "prev_fetched_at": None}
+                entry.update({f: str(stats.get(f) or "") for f in STAT_FIELDS})
+                if status == "ok" and old and old["status"] == "ok" and old["views"] and old["fetched_at"] < fetched_at:
+                    entry["prev_views"] = old["views"]
+                    entry["prev_fetched_at"] = old["fetched_at"]
+                rows.append(
+                    (key, platform) + tuple(entry[f] for f in STAT_FIELDS)
+                    + (status, fetched_at, entry["prev_views"], entry["prev_fetched_at"])
+                )
+                self._remember(key, entry)
+            if not rows:
+                return
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO stats (key, platform, {', '.join(STAT_FIELDS)}, status, fetched_at, "
+                f"prev_views, prev_fetched_at) VALUES ({','.join('?' * (len(STAT_FIELDS) + 6))})",
+                rows,
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def stats_from_entry(entry: dict) -> Dict[str, str]:
+    """The stats dict integrations merges into rows, from a cache entry."""
+    return {f: entry.get(f, "") for f in STAT_FIELDS if f != "username" or entry.get(f)}
+
+
+_cache: Optional[StatsCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> StatsCache:
+    """Process-wide cache instance (opened on first use)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = StatsCache()
+        return _cache
@@ -0,0 +1,201 @@
+"""
+HTTP-first TikTok stats fetcher
+Video pages embed their data as rehydration JSON, so most videos can be read with one
+plain HTTP request instead of a Playwright browser session. Videos this fails for are
+left to the browser session pool
+
+Usage (parse a saved page, e.g. to check the parser against a new page layout):
+    python tiktok_http.py saved_video_page.html [video_id]
+"""
+import asyncio
+import json
+import os
+import re
+import sys
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+
+import main as tiktokmod
+
+# Try plain HTTP before the browser (set to 0 to always use the browser sessions)
+ENABLED = os.getenv("TIKTOK_HTTP_FETCH", "1") != "0"
+
+# Page requests in flight at once
+HTTP_CONCURRENCY = int(os.getenv("TIKTOK_HTTP_CONCURRENCY", "16"))
+
+# Per-request timeout in seconds
+HTTP_TIMEOUT = float(os.getenv("TIKTOK_HTTP_TIMEOUT", "10"))
+
+# Stop trying HTTP for the rest of a run after this many failures in a row (TikTok is
+# serving bot checks), sending the remaining videos straight to the browser
+MAX_CONSECUTIVE_FAILURES = int(os.getenv("TIKTOK_HTTP_MAX_CONSECUTIVE_FAILURES", "20"))
+
+_UNIVERSAL_RE = re.compile(
+    r'<script[^>]*\bid="__UNIVERSAL_DATA_FOR_REHYDRATION__"[^>]*>(.*?)</script>', re.DOTALL
+)
+_SIGI_RE = re.compile(r'<script[^>]*\bid="SIGI_STATE"[^>]*>(.*?)</script>', re.DOTALL)
+
+
+def _log(msg: str):
+    print(msg, file=sys.stderr, flush=True)
+
+
+def _embedded_json(pattern: re.Pattern, html: str) -> Optional[dict]:
+    match = pattern.search(html)
+    if not match:
+        return None
+    try:
+        data = json.loads(match.group(1))
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _video_from_universal(data: dict) -> Optional[dict]:
+    detail = (data.get("__DEFAULT_SCOPE__") or {}).get("webapp.video-detail") or {}
+    if detail.get("statusCode") not in (None, 0):
+        return None
+    item = (detail.get("itemInfo") or {}).get("itemStruct")
+    return item if isinstance(item, dict) else None
+
+
+def _video_from_sigi(data: dict, video_id: Optional[str]) -> Optional[dict]:
+    items = data.get("ItemModule") or {}
+    if not isinstance(items, dict) or not items:
+        return None
+    item = items.get(video_id) if video_id else next(iter(items.values()))
+    return item if isinstance(item, dict) else None
+
+
+def parse_video_page(html: str, video_id: Optional[str] = None) -> Optional[Dict[str, str]]:
+    """
+    Extract a video's stats from the JSON embedded in its page.
+
+    Understands the current __UNIVERSAL_DATA_FOR_REHYDRATION__ layout and the older
+    SIGI_STATE one.
+
+    Args:
+        html: Page HTML
+        video_id: Expected video id (pages can embed other videos too)
+
+    Returns:
+        {"views", "likes", "comments", "date", "author"} as strings, or None when the
+        page carries no usable data (bot check, removed or private video, new layout)
+    """
+    item = None
+    data = _embedded_json(_UNIVERSAL_RE, html)
+    if data is not None:
+        item = _video_from_universal(data)
+    if item is None:
+        data = _embedded_json(_SIGI_RE, html)
+        if data is not None:
+            item = _video_from_sigi(data, video_id)
+    if item is None or (video_id and str(item.get("id", video_id)) != video_id):
+        return None
+
+    stats = item.get("stats") or {}
+    # statsV2 carries the same counts as strings, which don't overflow for huge videos
+    stats_v2 = item.get("statsV2") or {}
+    play_count = stats_v2.get("playCount", stats.get("playCount"))
+    if play_count is None:
+        return None
+    author = item.get("author")
+    if isinstance(author, dict):
+        author = author.get("uniqueId") or ""
+    return {
+        "views": tiktokmod.to_int_str(play_count),
+        "likes": tiktokmod.to_int_str(stats_v2.get("diggCount", stats.get("diggCount"))),
+        "comments": tiktokmod.to_int_str(stats_v2.get("commentCount", stats.get("commentCount"))),
+        "date": tiktokmod.format_date(item.get("createTime") or ""),
+        "author": author if isinstance(author, str) else "",
+    }
+
+
+def make_client() -> httpx.AsyncClient:
+    """Pooled client for video page requests."""
+    headers = dict(tiktokmod.BROWSER_HEADERS)
+    headers.pop("Connection", None)
+    return httpx.AsyncClient(
+        headers=headers,
+        timeout=HTTP_TIMEOUT,
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=HTTP_CONCURRENCY, max_keepalive_connections=HTTP_CONCURRENCY),
+    )
+
+
+async def fetch_stats(client: httpx.AsyncClient, url: str) -> Optional[Tuple[str, str, str, str, str, str]]:
+    """
+    Fetch one video's stats over plain HTTP.
+
+    Returns:
+        (url, views, likes, comments, date, "ok") like main.fetch_stats, or None when
+        the page didn't yield stats (the caller falls back to the browser)
+    """
+    match = tiktokmod.VID_RE.search(urlparse(url).path)
+    if not match:
+        return None
+    try:
+        response = await client.get(url)
+    except httpx.HTTPError:
+        return None
+    if response.status_code != 200:
+        return None
+    info = parse_video_page(response.text, match.group(1))
+    if info is None:
+        return None
+    return (url, info["views"], info["likes"], info["comments"], info["date"], "ok")
+
+
+async def fetch_many(urls: List[str], on_result: Optional[Callable] = None,
+                     concurrency: int = 0) -> Tuple[Dict[str, tuple], List[str]]:
+    """
+    Fetch many videos over HTTP.
+
+    on_result(result) is called for each success. After MAX_CONSECUTIVE_FAILURES misses
+    in a row the remaining videos are not tried.
+
+    Returns:
+        (url -> result tuple for successes, URLs left for the browser in input order)
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency or HTTP_CONCURRENCY))
+    results: Dict[str, tuple] = {}
+    consecutive_failures = 0
+    gave_up = False
+
+    async def _one(url: str):
+        nonlocal consecutive_failures, gave_up
+        async with semaphore:
+            if gave_up:
+                return
+            result = await fetch_stats(client, url)
+        if result is None:
+            consecutive_failures += 1
+            if MAX_CONSECUTIVE_FAILURES > 0 and consecutive_failures >= MAX_CONSECUTIVE_FAILURES and not gave_up:
+                gave_up = True
+                _log(f"TikTok pages are not returning stats over HTTP ({consecutive_failures} failures in a row); "
+                     f"using the browser for the remaining videos")
+            return
+        consecutive_failures = 0
+        results[url] = result
+        if on_result is not None:
+            on_result(result)
+
+    async with make_client() as client:
+        await asyncio.gather(*(_one(url) for url in urls))
+    return results, [url for url in urls if url not in results]
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python tiktok_http.py saved_video_page.html [video_id]", file=sys.stderr)
+        sys.exit(2)
+    with open(sys.argv[1], "r", encoding="utf-8", errors="replace") as fh:
+        html = fh.read()
+    video_id = sys.argv[2] if len(sys.argv) > 2 else None
+    print(json.dumps(parse_video_page(html, video_id), indent=2))
+
+
+if __name__ == "__main__":
+    main()
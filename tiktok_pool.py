@@ -0,0 +1,471 @@
+"""
+Pooled TikTok browser sessions
+Spreads video fetches across several TikTokApi sessions fed by a list of ms_tokens,
+with per-session concurrency caps and automatic rotation of failing sessions
+"""
+import asyncio
+import os
+import sys
+import time
+from typing import Callable, List, Optional, Set
+
+from TikTokApi import TikTokApi
+
+import main as tiktokmod
+
+# Comma-separated ms_tokens; falls back to the single ms_token variable
+MS_TOKENS = [t.strip() for t in os.getenv("TIKTOK_MS_TOKENS", "").split(",") if t.strip()] or (
+    [tiktokmod.MS_TOKEN] if tiktokmod.MS_TOKEN else []
+)
+
+# Number of browser sessions (default: one per ms_token, at least 1)
+NUM_SESSIONS = int(os.getenv("TIKTOK_NUM_SESSIONS", str(max(1, len(MS_TOKENS)))))
+
+# Concurrent fetches allowed on a single session (default: enough for the sessions together
+# to run TIKTOK_BATCH_SIZE fetches, so a single session keeps the old 20 at once; at least 5)
+SESSION_CONCURRENCY = int(os.getenv(
+    "TIKTOK_SESSION_CONCURRENCY",
+    str(max(5, -(-int(os.getenv("TIKTOK_BATCH_SIZE", "20")) // NUM_SESSIONS))),
+))
+
+# Consecutive failures after which a session is rotated out, and for how long (seconds)
+SESSION_MAX_FAILURES = int(os.getenv("TIKTOK_SESSION_MAX_FAILURES", "3"))
+SESSION_COOLDOWN = float(os.getenv("TIKTOK_SESSION_COOLDOWN", "120"))
+
+# Long-lived pools (web server) are recycled after this many fetches or minutes,
+# which caps Chromium memory growth (0 disables either limit)
+RECYCLE_AFTER_REQUESTS = int(os.getenv("TIKTOK_POOL_RECYCLE_REQUESTS", "500"))
+RECYCLE_AFTER_SECONDS = float(os.getenv("TIKTOK_POOL_RECYCLE_MINUTES", "30")) * 60
+
+# Seconds between health checks of a long-lived pool
+HEALTH_CHECK_INTERVAL = float(os.getenv("TIKTOK_POOL_HEALTH_INTERVAL", "60"))
+
+# Adaptive concurrency bounds for fetch_many, and the per-fetch latency (seconds)
+# above which the window stops growing
+MIN_CONCURRENCY = int(os.getenv("TIKTOK_MIN_CONCURRENCY", "2"))
+MAX_CONCURRENCY = int(os.getenv("TIKTOK_MAX_CONCURRENCY", "50"))
+LATENCY_TARGET = float(os.getenv("TIKTOK_LATENCY_TARGET", "15"))
+
+# Statuses that say nothing about the health of the session that produced them
+_NEUTRAL_STATUSES = {"ok", "no_video_id", "cancelled"}
+
+
+def _log(msg: str):
+    print(msg, file=sys.stderr, flush=True)
+
+
+class _SessionSlot:
+    """Bookkeeping for one TikTokApi session."""
+
+    def __init__(self, index: int, ms_token: Optional[str]):
+        self.index = index
+        self.ms_token = ms_token
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.benched_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def is_benched(self, now: float) -> bool:
+        return self.benched_until > now
+
+    @property
+    def label(self) -> str:
+        token = f" (ms_token ...{self.ms_token[-6:]})" if self.ms_token else ""
+        return f"session {self.index}{token}"
+
+
+class AdaptiveWindow:
+    """
+    AIMD concurrency window.
+
+    Grows by roughly one slot per window's worth of successful fetches while latency
+    stays under the target, and halves (at most once per window) when fetches fail.
+    """
+
+    def __init__(self, initial: int, minimum: int = MIN_CONCURRENCY, maximum: int = MAX_CONCURRENCY,
+                 latency_target: float = LATENCY_TARGET):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(self.maximum, max(self.minimum, initial)))
+        self.latency_target = latency_target
+        self.latency_ewma: Optional[float] = None
+        self._since_decrease = 0
+
+    @property
+    def size(self) -> int:
+        return int(self.limit)
+
+    def record(self, success: bool, latency: float) -> None:
+        self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+        self._since_decrease += 1
+        if not success:
+            # Only back off once per window so one burst of errors doesn't collapse it
+            if self._since_decrease >= self.size:
+                self.limit = max(float(self.minimum), self.limit / 2)
+                self._since_decrease = 0
+        elif self.latency_ewma <= self.latency_target:
+            self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+
+
+class TikTokSessionPool:
+    """
+    A TikTokApi instance with N sessions.
+
+    Each fetch is routed to the least-busy healthy session, under a per-session
+    concurrency cap. A session that fails SESSION_MAX_FAILURES times in a row is
+    rotated out for SESSION_COOLDOWN seconds; if every session ends up rotated out,
+    the pool restarts its sessions without the throttled ms_tokens.
+
+    Long-lived pools are recycled (browser relaunched) after RECYCLE_AFTER_REQUESTS
+    fetches or RECYCLE_AFTER_SECONDS, and maintain() health-checks them in the background.
+
+    Usage:
+        async with TikTokSessionPool() as pool:
+            result = await pool.fetch(url)
+    """
+
+    def __init__(
+        self,
+        num_sessions: Optional[int] = None,
+        ms_tokens: Optional[List[str]] = None,
+        per_session_concurrency: Optional[int] = None,
+        browser: Optional[str] = None,
+        timeout: Optional[int] = None,
+    ):
+        self.ms_tokens = list(ms_tokens if ms_tokens is not None else MS_TOKENS)
+        self.num_sessions = max(1, num_sessions or NUM_SESSIONS)
+        self.per_session_concurrency = max(1, per_session_concurrency or SESSION_CONCURRENCY)
+        self.browser = browser or os.getenv("TIKTOK_BROWSER", "chromium")
+        # 120 seconds default (Railway needs more time)
+        self.timeout = timeout or int(os.getenv("PLAYWRIGHT_TIMEOUT", "120000"))
+        self.api: Optional[TikTokApi] = None
+        self.slots: List[_SessionSlot] = []
+        self.throttled_tokens: Set[str] = set()
+        self.started_at = 0.0
+        self.requests_since_start = 0
+        self.recycles = 0
+        # Bumped by every successful start, so waiters can tell the pool was relaunched meanwhile
+        self.generation = 0
+        self._draining = False
+        self._cond = asyncio.Condition()
+        self._lifecycle_lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    @property
+    def capacity(self) -> int:
+        """Maximum number of fetches the pool runs at once."""
+        return max(1, len(self.slots)) * self.per_session_concurrency
+
+    def _usable_tokens(self) -> Optional[List[str]]:
+        tokens = [t for t in self.ms_tokens if t not in self.throttled_tokens]
+        if not tokens and self.ms_tokens:
+            # Every token was throttled; give them all another chance rather than none
+            self.throttled_tokens.clear()
+            tokens = list(self.ms_tokens)
+        return tokens or None
+
+    async def start(self) -> None:
+        """Launch the browser and create the sessions (tries firefox if the preferred browser fails)."""
+        browsers_to_try = [self.browser]
+        if self.browser != "firefox":
+            browsers_to_try.append("firefox")
+
+        last_error: Optional[Exception] = None
+        for browser in browsers_to_try:
+            _log(f"Attempting {self.num_sessions} TikTok session(s) with {browser} browser (timeout: {self.timeout}ms)...")
+            api = TikTokApi()
+            try:
+                await api.create_sessions(
+                    ms_tokens=self._usable_tokens(),
+                    num_sessions=self.num_sessions,
+                    sleep_after=1,
+                    headless=True,
+                    browser=browser,
+                    timeout=self.timeout,
+                )
+                if not api.sessions:
+                    raise RuntimeError("no sessions were created")
+            except Exception as e:
+                _log(f"✗ Failed to create TikTok session with {browser}: {e}")
+                last_error = e
+                await self._shutdown_api(api)
+                continue
+
+            self.api = api
+            self.browser = browser
+            self.started_at = time.monotonic()
+            self.requests_since_start = 0
+            self.generation += 1
+            self.slots = [
+                _SessionSlot(i, getattr(session, "ms_token", None))
+                for i, session in enumerate(api.sessions)
+            ]
+            _log(f"✓ {len(self.slots)} TikTok session(s) created successfully with {browser}")
+            return
+
+        raise RuntimeError(f"Could not initialize TikTok API with any browser. Last error: {last_error}")
+
+    @staticmethod
+    async def _shutdown_api(api: TikTokApi) -> None:
+        try:
+            await api.close_sessions()
+        except Exception:
+            pass
+        try:
+            await api.stop_playwright()
+        except Exception:
+            pass
+
+    async def close(self) -> None:
+        """Close all sessions and the browser."""
+        api, self.api = self.api, None
+        self.slots = []
+        if api is not None:
+            await self._shutdown_api(api)
+
+    async def ensure_started(self) -> None:
+        """Start the pool unless it is already running (safe to call from many tasks)."""
+        if self.api is not None:
+            return
+        async with self._lifecycle_lock:
+            if self.api is None:
+                await self.start()
+
+    async def _restart(self) -> None:
+        """Recreate all sessions, leaving out throttled ms_tokens."""
+        async with self._lifecycle_lock:
+            now = time.monotonic()
+            if any(not s.is_benched(now) for s in self.slots):
+                return  # Another task already restarted the pool
+            _log("All TikTok sessions rotated out; recreating sessions with fresh ms_tokens...")
+            await self.close()
+            await self.start()
+
+    def needs_recycle(self) -> bool:
+        """True once the pool has served RECYCLE_AFTER_REQUESTS fetches or is RECYCLE_AFTER_SECONDS old."""
+        if self.api is None:
+            return False
+        if RECYCLE_AFTER_REQUESTS and self.requests_since_start >= RECYCLE_AFTER_REQUESTS:
+            return True
+        return bool(RECYCLE_AFTER_SECONDS and time.monotonic() - self.started_at >= RECYCLE_AFTER_SECONDS)
+
+    async def recycle(self, reason: str, generation: Optional[int] = None) -> None:
+        """
+        Let in-flight fetches finish, then relaunch the browser and sessions.
+
+        Args:
+            reason: Logged with the recycle
+            generation: Pool generation the caller decided to recycle (default: the current
+                one). If another task relaunched the pool while this one waited, nothing happens.
+        """
+        if generation is None:
+            generation = self.generation
+        async with self._lifecycle_lock:
+            if self.api is None or self.generation != generation:
+                return
+            async with self._cond:
+                self._draining = True
+                while any(s.in_flight for s in self.slots):
+                    await self._cond.wait()
+            _log(f"Recycling TikTok sessions ({reason})...")
+            try:
+                await self.close()
+                await self.start()
+                self.recycles += 1
+            finally:
+                async with self._cond:
+                    self._draining = False
+                    self._cond.notify_all()
+
+    async def health_check(self) -> bool:
+        """Check that the browser is still connected and every session page is open."""
+        api = self.api
+        if api is None or not api.sessions:
+            return False
+        try:
+            browser = getattr(api, "browser", None)
+            if browser is not None and hasattr(browser, "is_connected") and not browser.is_connected():
+                return False
+            for session in api.sessions:
+                page = getattr(session, "page", None)
+                if page is not None and page.is_closed():
+                    return False
+        except Exception:
+            return False
+        return True
+
+    async def maintain(self, interval: Optional[float] = None) -> None:
+        """Health-check and recycle a long-lived pool until cancelled."""
+        interval = interval or HEALTH_CHECK_INTERVAL
+        while True:
+            await asyncio.sleep(interval)
+            if self.api is None:
+                continue  # Not started yet (or a restart failed); the next fetch starts it
+            try:
+                generation = self.generation
+                if not await self.health_check():
+                    await self.recycle("failed health check", generation)
+                elif self.needs_recycle():
+                    await self.recycle(f"{self.requests_since_start} requests, {(time.monotonic() - self.started_at) / 60:.0f} minutes",
+                                       generation)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                _log(f"Warning: TikTok pool maintenance failed: {e}")
+
+    def status(self) -> dict:
+        """Snapshot of the pool for health endpoints."""
+        now = time.monotonic()
+        return {
+            "started": self.api is not None,
+            "browser": self.browser,
+            "sessions": len(self.slots),
+            "healthy_sessions": sum(1 for s in self.slots if not s.is_benched(now)),
+            "in_flight": sum(s.in_flight for s in self.slots),
+            "requests_since_start": self.requests_since_start,
+            "age_seconds": round(now - self.started_at) if self.api is not None else 0,
+            "recycles": self.recycles,
+        }
+
+    def _pick(self) -> Optional[_SessionSlot]:
+        if self._draining:
+            return None
+        now = time.monotonic()
+        free = [s for s in self.slots if s.in_flight < self.per_session_concurrency]
+        healthy = [s for s in free if not s.is_benched(now)]
+        if healthy:
+            return min(healthy, key=lambda s: (s.in_flight, s.consecutive_failures))
+        return None
+
+    async def _acquire(self) -> _SessionSlot:
+        async with self._cond:
+            while True:
+                slot = self._pick()
+                if slot is not None:
+                    slot.in_flight += 1
+                    slot.requests += 1
+                    return slot
+                now = time.monotonic()
+                all_benched = self.slots and all(s.is_benched(now) for s in self.slots)
+                if all_benched and not any(s.in_flight for s in self.slots):
+                    break
+                try:
+                    # Benched sessions come back on their own, so re-check periodically
+                    await asyncio.wait_for(self._cond.wait(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    pass
+        await self._restart()
+        return await self._acquire()
+
+    async def _release(self, slot: _SessionSlot, status: str) -> None:
+        async with self._cond:
+            slot.in_flight -= 1
+            self.requests_since_start += 1
+            if status in _NEUTRAL_STATUSES:
+                slot.consecutive_failures = 0
+            else:
+                slot.failures += 1
+                slot.consecutive_failures += 1
+                if slot.consecutive_failures >= SESSION_MAX_FAILURES and not slot.is_benched(time.monotonic()):
+                    slot.benched_until = time.monotonic() + SESSION_COOLDOWN
+                    slot.consecutive_failures = 0
+                    if slot.ms_token:
+                        self.throttled_tokens.add(slot.ms_token)
+                    _log(f"Rotating out TikTok {slot.label} for {SESSION_COOLDOWN:.0f}s after repeated failures")
+            self._cond.notify_all()
+
+    async def fetch(self, url: str):
+        """Fetch stats for one video on the least-busy healthy session (same tuple as main.fetch_stats)."""
+        if self.needs_recycle():
+            await self.recycle(f"{self.requests_since_start} requests, {(time.monotonic() - self.started_at) / 60:.0f} minutes",
+                               self.generation)
+        await self.ensure_started()
+        slot = await self._acquire()
+        status = "error"
+        try:
+            # Sessions may have been dropped by TikTokApi; let it pick one if the index is gone
+            api = self.api
+            session_index = slot.index if slot.index < len(api.sessions) else None
+            result = await tiktokmod.fetch_stats(api, url, session_index=session_index)
+            status = result[-1]
+            return result
+        except asyncio.CancelledError:
+            status = "cancelled"  # The caller gave up; says nothing about the session
+            raise
+        finally:
+            await self._release(slot, status)
+
+    async def fetch_many(self, urls: List[str], initial_concurrency: int, on_result: Optional[Callable] = None) -> list:
+        """
+        Fetch many videos through a continuous work queue.
+
+        A new fetch starts the moment one finishes, with the number in flight set by
+        an AdaptiveWindow (capped by the pool's session capacity). Results are returned
+        in input order; exceptions become error tuples. on_result(done, total, result)
+        is called after each completion.
+        """
+        total = len(urls)
+        results: list = [None] * total
+        window = AdaptiveWindow(initial_concurrency, maximum=min(MAX_CONCURRENCY, self.capacity))
+        queue = iter(enumerate(urls))
+        in_flight = {}
+        done_count = 0
+        exhausted = False
+
+        async def _timed(url: str):
+            started = time.monotonic()
+            try:
+                return await self.fetch(url), time.monotonic() - started
+            except Exception as e:
+                return e, time.monotonic() - started
+
+        try:
+            while True:
+                while not exhausted and len(in_flight) < window.size:
+                    try:
+                        idx, url = next(queue)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    in_flight[asyncio.ensure_future(_timed(url))] = (idx, url)
+                if not in_flight:
+                    break
+
+                finished, _ = await asyncio.wait(in_flight.keys(), return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    idx, url = in_flight.pop(task)
+                    result, latency = task.result()
+                    if isinstance(result, Exception):
+                        _log(f"Warning: TikTok fetch failed for {url}: {result}")
+                        result = (url, "", "", "", "", f"error:{type(result).__name__}")
+                    window.record(result[-1] in _NEUTRAL_STATUSES, latency)
+                    results[idx] = result
+                    done_count += 1
+                    if on_result is not None:
+                        on_result(done_count, total, result)
+        finally:
+            # Stopped early (e.g. the stage deadline): don't leave fetches holding pool slots
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
+        return results
+
+
+# Pool shared across jobs by a long-lived process (the web server); None in the CLI
+_shared_pool: Optional[TikTokSessionPool] = None
+
+
+def get_shared_pool() -> Optional[TikTokSessionPool]:
+    return _shared_pool
+
+
+def set_shared_pool(pool: Optional[TikTokSessionPool]) -> None:
+    global _shared_pool
+    _shared_pool = pool
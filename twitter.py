@@ -2,10 +2,15 @@
 X (Twitter) integration for fetching tweet engagement metrics
 Uses Twitter API v2
 """
+import asyncio
 import os
 import re
+import sys
+import time
+from collections import deque
 from urllib.parse import urlparse
-from typing import Optional, Tuple, Dict
+from typing import Optional, Tuple, Dict, List
+import httpx
 import requests
 from requests_oauthlib import OAuth1
 
@@ -20,6 +25,12 @@ BEARER_TOKEN = os.environ.get("TWITTER_BEARER_TOKEN", "")
 API_V2_BASE = "https://api.twitter.com/2"
 API_V1_BASE = "https://api.twitter.com/1.1"
 
+# /2/tweets?ids= accepts at most 100 ids per call
+BULK_BATCH_SIZE = 100
+# Longest total time the bulk fetcher will wait for rate-limit windows to reset
+# before giving up on the remaining ids (default: one 15-minute window)
+MAX_RATE_LIMIT_WAIT = float(os.getenv("TWITTER_MAX_RATE_LIMIT_WAIT", "900"))
+
 # Regex patterns for extracting tweet IDs
 TWEET_ID_PATTERNS = [
     re.compile(r'twitter\.com/[^/]+/status/(\d+)'),
@@ -87,9 +98,13 @@ def canonicalize_twitter_url(url: str) -> Optional[str]:
     """
     tweet_id = extract_tweet_id(url)
     if tweet_id:
-        return f"https://x.com/i/status/{tweet_id}"
+        return canonical_url_for_id(tweet_id)
     return None
 
+def canonical_url_for_id(tweet_id: str) -> str:
+    """Build the canonical status URL for a tweet ID."""
+    return f"https://x.com/i/status/{tweet_id}"
+
 def fetch_tweet_stats_v2(tweet_id: str, bearer_token: Optional[str] = None) -> Tuple[str, str, str, str, str, str]:
     """
     Fetch statistics for a tweet using Twitter API v2.
@@ -159,6 +174,148 @@ def fetch_tweet_stats_v2(tweet_id: str, bearer_token: Optional[str] = None) -> T
     except Exception as e:
         return (tweet_id, "", "", "", "", f"error:{type(e).__name__}")
 
+class RateLimitWindow:
+    """
+    Tracks the x-rate-limit-remaining / x-rate-limit-reset headers so requests can be
+    paced to fit the current window instead of being rejected with 429.
+    """
+
+    def __init__(self):
+        self.remaining: Optional[int] = None
+        self.reset_at: Optional[float] = None  # Unix epoch seconds
+
+    def update(self, headers) -> None:
+        try:
+            if headers.get("x-rate-limit-remaining") is not None:
+                self.remaining = int(headers["x-rate-limit-remaining"])
+            if headers.get("x-rate-limit-reset") is not None:
+                self.reset_at = float(headers["x-rate-limit-reset"])
+        except (TypeError, ValueError):
+            pass
+
+    def wait_time(self, now: Optional[float] = None) -> float:
+        """Seconds to wait before the next request may be sent (0 if one is available)."""
+        if self.remaining is None or self.remaining > 0 or self.reset_at is None:
+            return 0.0
+        now = time.time() if now is None else now
+        # Small buffer so the request lands after the window has actually reset
+        return max(0.0, self.reset_at - now + 1.0)
+
+def _parse_bulk_response(data: Dict, batch: List[str]) -> Dict[str, Tuple[str, str, str, str, str, str]]:
+    # Ids absent from "data" were deleted, protected or never existed
+    results = {tid: (tid, "", "", "", "", "not_found") for tid in batch}
+    for tweet_data in data.get("data") or []:
+        tid = tweet_data.get("id")
+        if tid not in results:
+            continue
+        metrics = tweet_data.get("public_metrics", {})
+        # Note: View count is not available in free API tier
+        results[tid] = (
+            tid,
+            "",
+            str(metrics.get("like_count", "")),
+            str(metrics.get("retweet_count", "")),
+            str(metrics.get("reply_count", "")),
+            "ok",
+        )
+    return results
+
+async def fetch_tweets_stats_bulk(
+    tweet_ids: List[str],
+    bearer_token: Optional[str] = None,
+    max_wait: Optional[float] = None,
+) -> Dict[str, Tuple[str, str, str, str, str, str]]:
+    """
+    Fetch statistics for many tweets using /2/tweets?ids=, BULK_BATCH_SIZE ids per call.
+    
+    Batches are sent from a queue paced by the x-rate-limit-* response headers: when
+    the window is exhausted (or a 429 comes back) the queue waits for the reset and
+    retries instead of dropping the batch.
+    
+    Args:
+        tweet_ids: Twitter tweet IDs (duplicates are fetched once)
+        bearer_token: Twitter API v2 Bearer Token
+        max_wait: Total seconds to spend waiting for resets (default: MAX_RATE_LIMIT_WAIT);
+                  ids still queued after that are returned as "rate_limited"
+        
+    Returns:
+        Dict of tweet_id -> (tweet_id, views, likes, retweets, replies, status)
+    """
+    unique_ids = list(dict.fromkeys(t for t in tweet_ids if t))
+    if not unique_ids:
+        return {}
+
+    if not bearer_token:
+        bearer_token = BEARER_TOKEN
+
+    if not bearer_token:
+        return {tid: (tid, "", "", "", "", "no_bearer_token") for tid in unique_ids}
+
+    wait_budget = MAX_RATE_LIMIT_WAIT if max_wait is None else max_wait
+    window = RateLimitWindow()
+    queue = deque(unique_ids[i:i + BULK_BATCH_SIZE] for i in range(0, len(unique_ids), BULK_BATCH_SIZE))
+    results: Dict[str, Tuple[str, str, str, str, str, str]] = {}
+    headers = {
+        "Authorization": f"Bearer {bearer_token}"
+    }
+    backoff = 15.0  # Used when a 429 arrives without a reset header
+
+    async with httpx.AsyncClient(timeout=10, headers=headers) as client:
+        while queue:
+            wait = window.wait_time()
+            if wait > 0:
+                if wait > wait_budget:
+                    print(f"Warning: Twitter rate limit resets in {wait:.0f}s; leaving {sum(len(b) for b in queue)} tweets for the next run", file=sys.stderr)
+                    break
+                print(f"Twitter rate limit reached, waiting {wait:.0f}s for the window to reset...", file=sys.stderr)
+                await asyncio.sleep(wait)
+                wait_budget -= wait
+                window.remaining = None
+
+            batch = queue.popleft()
+            try:
+                response = await client.get(
+                    f"{API_V2_BASE}/tweets",
+                    params={"ids": ",".join(batch), "tweet.fields": "public_metrics"},
+                )
+            except httpx.TimeoutException:
+                results.update({tid: (tid, "", "", "", "", "timeout") for tid in batch})
+                continue
+            except httpx.HTTPError:
+                results.update({tid: (tid, "", "", "", "", "request_error") for tid in batch})
+                continue
+
+            window.update(response.headers)
+
+            # Handle rate limit: requeue the batch and wait for the window
+            if response.status_code == 429:
+                queue.appendleft(batch)
+                if window.wait_time() <= 0:
+                    window.remaining = 0
+                    window.reset_at = time.time() + backoff
+                    backoff = min(backoff * 2, 300.0)
+                continue
+
+            # Handle unauthorized
+            if response.status_code == 401:
+                results.update({tid: (tid, "", "", "", "", "unauthorized") for tid in batch})
+                continue
+
+            # Handle other errors
+            if response.status_code != 200:
+                results.update({tid: (tid, "", "", "", "", f"http_error_{response.status_code}") for tid in batch})
+                continue
+
+            try:
+                results.update(_parse_bulk_response(response.json(), batch))
+            except Exception as e:
+                results.update({tid: (tid, "", "", "", "", f"error:{type(e).__name__}") for tid in batch})
+
+    # Anything still queued ran out of rate-limit budget
+    for batch in queue:
+        results.update({tid: (tid, "", "", "", "", "rate_limited") for tid in batch})
+    return results
+
 def fetch_tweet_stats_by_url(url: str, bearer_token: Optional[str] = None) -> Tuple[str, str, str, str, str, str]:
     """
     Fetch statistics for a tweet by URL.
@@ -0,0 +1,138 @@
+"""
+Parse-once URL index for sheet rows
+Each row URL is classified and canonicalized a single time into a ParsedUrl record
+that classification, fetching and the row merge all consume
+"""
+from typing import Dict, List, NamedTuple, Optional
+from urllib.parse import urlparse, urlunparse
+
+import main as tiktokmod
+import youtube as ytmod
+import twitter as twmod
+
+# Platform identifiers
+TIKTOK = "tiktok"
+YOUTUBE = "youtube"
+TWITTER = "twitter"
+INSTAGRAM = "instagram"
+FACEBOOK = "facebook"
+
+# Value written to the channel column for each platform
+CHANNEL_LABELS = {
+    TIKTOK: "TikTok",
+    YOUTUBE: "YouTube",
+    TWITTER: "Twitter",
+    INSTAGRAM: "IG",
+}
+
+# Instagram path segments that are not usernames
+_IG_KIND_PATHS = {"p", "reel", "reels", "tv", "stories"}
+
+
+class ParsedUrl(NamedTuple):
+    """Everything later stages need to know about one row's URL."""
+    row: int            # 1-based sheet row
+    url: str            # cleaned URL as it appears in the sheet
+    platform: str       # one of the platform identifiers above, or "" if unknown
+    key: str            # canonical URL used to dedupe fetches and look up stats ("" if not fetchable)
+    platform_id: str    # TikTok video ID, YouTube video ID, tweet ID or IG shortcode
+    account: str        # username embedded in the URL, if any
+
+    @property
+    def channel(self) -> str:
+        return CHANNEL_LABELS.get(self.platform, "")
+
+
+def _classify_host(host: str) -> str:
+    if "tiktok.com" in host:
+        return TIKTOK
+    if "youtube.com" in host or "youtu.be" in host:
+        return YOUTUBE
+    if "twitter.com" in host or "x.com" in host:
+        return TWITTER
+    if "instagram.com" in host:
+        return INSTAGRAM
+    if "facebook.com" in host or "fb.com" in host or "fb.watch" in host:
+        return FACEBOOK
+    return ""
+
+
+def parse_url(row: int, url: str, tiktok_expanded: Optional[Dict[str, str]] = None) -> ParsedUrl:
+    """
+    Classify and canonicalize a single cleaned URL.
+
+    Args:
+        row: 1-based sheet row the URL came from
+        url: Cleaned URL
+        tiktok_expanded: Short link -> expanded URL mapping from link_resolver
+
+    Returns:
+        ParsedUrl record (platform "" and empty key for unrecognised URLs)
+    """
+    try:
+        parsed = urlparse(url)
+    except ValueError:
+        return ParsedUrl(row, url, "", "", "", "")
+    platform = _classify_host((parsed.netloc or "").lower())
+    key = platform_id = account = ""
+
+    if platform == TIKTOK:
+        expanded = (tiktok_expanded or {}).get(url, url)
+        if expanded != url:
+            parsed = urlparse(expanded)
+        match = tiktokmod.VID_RE.search(parsed.path)
+        if match and "tiktok.com" in (parsed.netloc or "").lower():
+            key = expanded
+            platform_id = match.group(1)
+        for part in parsed.path.strip("/").split("/"):
+            if part.startswith("@"):
+                account = part[1:]
+                break
+    elif platform == YOUTUBE:
+        video_id = ytmod.extract_video_id(url)
+        if video_id:
+            platform_id = video_id
+            key = ytmod.canonical_url_for_id(video_id)
+    elif platform == TWITTER:
+        if "/status/" in url:
+            tweet_id = twmod.extract_tweet_id(url)
+            if tweet_id:
+                platform_id = tweet_id
+                key = twmod.canonical_url_for_id(tweet_id)
+    elif platform == INSTAGRAM:
+        # Same canonical form as igmod.canonicalize_instagram_url, without re-parsing
+        key = urlunparse(parsed._replace(query="", fragment="")).rstrip("/")
+        parts = parsed.path.strip("/").split("/")
+        if parts and parts[0] and parts[0] not in _IG_KIND_PATHS:
+            account = parts[0]
+        for kind_idx, part in enumerate(parts[:-1]):
+            if part in _IG_KIND_PATHS:
+                platform_id = parts[kind_idx + 1]
+                break
+
+    return ParsedUrl(row, url, platform, key, platform_id, account)
+
+
+def build_url_index(
+    row_urls: Dict[int, str],
+    tiktok_expanded: Optional[Dict[str, str]] = None,
+) -> Dict[int, ParsedUrl]:
+    """Parse every row URL once. Returns row -> ParsedUrl."""
+    return {r: parse_url(r, u, tiktok_expanded) for r, u in row_urls.items()}
+
+
+def unique_keys(index: Dict[int, ParsedUrl], platform: str) -> List[str]:
+    """Canonical keys for one platform, deduplicated and in sheet order."""
+    seen = set()
+    keys: List[str] = []
+    for entry in index.values():
+        if entry.platform == platform and entry.key and entry.key not in seen:
+            seen.add(entry.key)
+            keys.append(entry.key)
+    return keys
+
+
+def platform_ids(index: Dict[int, ParsedUrl], platform: str) -> Dict[str, str]:
+    """Canonical key -> platform id (video ID, tweet ID, ...) for one platform."""
+    return {entry.key: entry.platform_id for entry in index.values()
+            if entry.platform == platform and entry.key}
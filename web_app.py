@@ -4,9 +4,12 @@ Provides a REST API and serves the frontend
 """
 
 import asyncio
+import hmac
 import json
 import os
+import secrets
 import tempfile
+from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Optional
 from dotenv import load_dotenv
@@ -14,7 +17,7 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException, WebSocket, WebSocketDisconnect, Depends, Header
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, WebSocket, WebSocketDisconnect, Depends, Header, Request
 from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -22,10 +25,65 @@ import uvicorn
 
 import config_store
 import integrations as integrations_mod
+import apify_runs
+import blocking_io
+import jobs
+import progress
+import run_journal
 import firebase_config
 import firebase_service
+import tiktok_pool
 
-app = FastAPI(title="Kalshi Internal - Impressions Tool", description="TikTok & Instagram stats updater")
+# Keep a warm TikTok browser pool shared across jobs (set TIKTOK_WARM_POOL=0 to launch per job)
+TIKTOK_WARM_POOL = os.getenv("TIKTOK_WARM_POOL", "1") != "0"
+
+# Public URL of /api/apify/webhook; when set, Instagram runs report completion there
+# instead of being long-polled (unset = poll, e.g. when Apify can't reach this server)
+APIFY_WEBHOOK_URL = os.getenv("APIFY_WEBHOOK_URL", "")
+
+# Shared secret Apify sends back with each webhook (random per process if unset)
+APIFY_WEBHOOK_SECRET = os.getenv("APIFY_WEBHOOK_SECRET", "") or secrets.token_urlsafe(24)
+
+
+async def _warm_tiktok_pool(pool: tiktok_pool.TikTokSessionPool):
+    """Start the TikTok sessions in the background so server startup isn't delayed."""
+    try:
+        await pool.ensure_started()
+    except Exception as e:
+        # Not fatal: the first job retries the launch
+        print(f"WARNING: Failed to warm TikTok session pool: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Own long-lived resources: the job workers, the shared TikTok session pool and its maintenance task."""
+    pool = None
+    tasks = []
+    progress.bus.bind(asyncio.get_running_loop())
+    if APIFY_WEBHOOK_URL:
+        separator = "&" if "?" in APIFY_WEBHOOK_URL else "?"
+        apify_runs.enable_webhooks(f"{APIFY_WEBHOOK_URL}{separator}secret={APIFY_WEBHOOK_SECRET}")
+    job_manager.start()
+    if TIKTOK_WARM_POOL:
+        pool = tiktok_pool.TikTokSessionPool()
+        tiktok_pool.set_shared_pool(pool)
+        tasks.append(asyncio.create_task(_warm_tiktok_pool(pool)))
+        tasks.append(asyncio.create_task(pool.maintain()))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await job_manager.stop()
+        apify_runs.enable_webhooks(None)
+        blocking_io.shutdown()
+        if pool is not None:
+            tiktok_pool.set_shared_pool(None)
+            await pool.close()
+
+
+app = FastAPI(title="Kalshi Internal - Impressions Tool", description="TikTok & Instagram stats updater", lifespan=lifespan)
 
 # Enable CORS
 # In production, set ALLOWED_ORIGINS env var to comma-separated list of domains
@@ -39,8 +97,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Store for WebSocket connections
-active_connections = []
+
+def _journal_key(params: dict) -> str:
+    """Jobs for the same sheet and row range share a run journal, so they must not overlap"""
+    return run_journal.journal_id(params.get("spreadsheet") or "", params.get("worksheet") or "",
+                                  params.get("start_row"), params.get("end_row"))
+
+
+# Sheet updates run as background jobs; clients poll /api/jobs/{job_id}
+job_manager = jobs.JobManager(integrations_mod.update_sheet_views_likes_comments, exclusive_key=_journal_key)
 
 # Store for OAuth flow state (temporary, during OAuth flow)
 oauth_flow_state = {}
@@ -52,34 +117,15 @@ oauth_credentials = {}  # user_id -> Credentials object
 # Firebase ID Token verification
 async def verify_firebase_token(authorization: str = Header(None)) -> str:
     """Verify Firebase ID token and return user_id"""
-    print(f"DEBUG: verify_firebase_token called, auth header present: {bool(authorization)}")
-    
     if not authorization or not authorization.startswith("Bearer "):
-        print("ERROR: Missing or invalid authorization header")
         raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
-    
+
     id_token = authorization.split("Bearer ")[1]
-    print(f"DEBUG: ID token length: {len(id_token)}")
-    print(f"DEBUG: ID token preview: {id_token[:50]}...")
-    
-    try:
-        decoded_token = firebase_service.verify_id_token(id_token)
-        print(f"DEBUG: Token decoded: {bool(decoded_token)}")
-        
-        if not decoded_token:
-            print("ERROR: verify_id_token returned None")
-            raise HTTPException(status_code=401, detail="Invalid token - verification failed")
-        
-        user_id = decoded_token.get('uid')
-        print(f"DEBUG: User ID from token: {user_id}")
-        return user_id
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"ERROR: Token verification exception: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
+    # Cached by token until it expires; only the first request with a token pays for verification
+    decoded_token = await firebase_service.verify_id_token_cached(id_token)
+    if not decoded_token or not decoded_token.get('uid'):
+        raise HTTPException(status_code=401, detail="Invalid token - verification failed")
+    return decoded_token['uid']
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -347,23 +393,13 @@ async def update_sheets(
     disable_columns: Optional[str] = Form(""),
     override: bool = Form(True),
     start_row: Optional[int] = Form(None),
-    end_row: Optional[int] = Form(None)
+    end_row: Optional[int] = Form(None),
+    use_cache: bool = Form(True),
+    chunk_rows: Optional[int] = Form(None),
+    resume: bool = Form(False)
 ):
-    """Run the sheet update process"""
-    print(f"DEBUG: update_sheets called for user {user_id}")
-    print(f"DEBUG: spreadsheet={spreadsheet}, worksheet={worksheet}")
-    
-    # Set a timeout of 25 minutes (Railway has 30-minute limit, leave buffer)
-    TIMEOUT_SECONDS = 25 * 60
-    
+    """Queue a sheet update and return its job id (poll /api/jobs/{job_id} for progress)"""
     try:
-        # Use the shared service account - no per-user credentials needed!
-        # Users just need to share their Google Sheet with the service account email
-        # Pass empty string to let integrations.py handle env var lookup
-        creds_path = ""
-        
-        print(f"DEBUG: Using shared service account for user {user_id}")
-        
         disabled_cols = []
         if disable_columns:
             disabled_cols = [col.strip().lower() for col in disable_columns.split(',')]
@@ -374,50 +410,51 @@ async def update_sheets(
             if end_row is not None and end_row < start_row:
                 raise HTTPException(status_code=400, detail="End row must be >= start row")
         
-        # Wrap the update call with a timeout
-        try:
-            await asyncio.wait_for(
-                integrations_mod.update_sheet_views_likes_comments(
-                    spreadsheet=spreadsheet,
-                    worksheet=worksheet,
-                    creds_path=creds_path,
-                    disabled_columns=disabled_cols,
-                    override=override,
-                    start_row=start_row,
-                    end_row=end_row,
-                ),
-                timeout=TIMEOUT_SECONDS
-            )
-        except asyncio.TimeoutError:
-            print(f"ERROR: Update timed out after {TIMEOUT_SECONDS} seconds")
-            return JSONResponse(
-                status_code=504,  # Gateway Timeout
-                content={
-                    "success": False, 
-                    "message": f"Update timed out after {TIMEOUT_SECONDS // 60} minutes. For large sheets (1000+ URLs), try processing in smaller batches using row ranges."
-                }
-            )
+        # Use the shared service account - no per-user credentials needed!
+        # Users just need to share their Google Sheet with the service account email
+        # Pass empty string to let integrations.py handle env var lookup
+        job = job_manager.submit(user_id, {
+            "spreadsheet": spreadsheet,
+            "worksheet": worksheet,
+            "creds_path": "",
+            "disabled_columns": disabled_cols,
+            "override": override,
+            "start_row": start_row,
+            "end_row": end_row,
+            "use_cache": use_cache,
+            "chunk_rows": chunk_rows,
+            "resume": resume,
+        })
+        print(f"Queued update job {job.id} for user {user_id}")
         
-        return {
-            "success": True,
-            "message": "Sheet updated successfully"
-        }
+        return JSONResponse(
+            status_code=202,
+            content={
+                "success": True,
+                "message": "Update queued",
+                "job_id": job.id,
+                "status_url": f"/api/jobs/{job.id}",
+                "queue_position": job_manager.queue_position(job),
+            }
+        )
     except HTTPException:
         # Re-raise HTTP exceptions as-is
         raise
-    except ValueError as e:
-        error_msg = str(e)
-        print(f"ERROR: Validation error in update_sheets: {error_msg}")
-        import traceback
-        traceback.print_exc()
+    except jobs.JobConflictError as e:
+        content = {"success": False, "message": str(e)}
+        if e.job.user_id == user_id:
+            # Let the client follow the update it already started
+            content["job_id"] = e.job.id
+            content["status_url"] = f"/api/jobs/{e.job.id}"
+        return JSONResponse(status_code=409, content=content)
+    except jobs.QueueFullError as e:
         return JSONResponse(
-            status_code=400,
-            content={"success": False, "message": error_msg}
+            status_code=503,
+            content={"success": False, "message": f"Too many updates queued, please try again shortly ({e})"}
         )
     except Exception as e:
         error_msg = str(e)
         print(f"ERROR: Exception in update_sheets: {error_msg}")
-        print(f"ERROR: Exception type: {type(e).__name__}")
         import traceback
         traceback.print_exc()
         return JSONResponse(
@@ -426,6 +463,19 @@ async def update_sheets(
         )
 
 
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str, user_id: str = Depends(verify_firebase_token)):
+    """Report a sheet update job's state, counts and timings"""
+    job = job_manager.get(job_id)
+    if job is None or job.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {
+        "success": True,
+        **job.to_dict(),
+        "queue_position": job_manager.queue_position(job),
+    }
+
+
 @app.get("/api/check-apify-token")
 async def check_apify_token():
     """Check if APIFY_TOKEN is set"""
@@ -459,24 +509,88 @@ async def set_apify_token(token: str = Form(...)):
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket endpoint for real-time progress updates"""
+    """
+    WebSocket endpoint for real-time progress updates
+
+    The client sends {"action": "subscribe", "job_id": ..., "token": <Firebase ID token>};
+    the server then pushes {"type": "batch", "events": [...]} messages with coalesced
+    progress, log and job-state events until the job finishes.
+    """
     await websocket.accept()
-    active_connections.append(websocket)
     try:
+        message = await websocket.receive_json()
+    except (WebSocketDisconnect, ValueError):
+        return
+    job_id = str(message.get("job_id") or "") if isinstance(message, dict) else ""
+    token = str(message.get("token") or "") if isinstance(message, dict) else ""
+    decoded = await firebase_service.verify_id_token_cached(token)
+    job = job_manager.get(job_id)
+    if not decoded or job is None or job.user_id != decoded.get("uid"):
+        await websocket.send_json({"type": "error", "message": "Job not found"})
+        await websocket.close(code=4404)
+        return
+
+    # Starts from the job's latest state, so a finished job gets its final event straight away
+    sub = progress.bus.subscribe(job_id)
+
+    async def _drain_client():
+        # Only used to notice the client going away
         while True:
             await websocket.receive_text()
-    except WebSocketDisconnect:
-        active_connections.remove(websocket)
+
+    receiver = asyncio.create_task(_drain_client())
+    try:
+        while not receiver.done():
+            batch_task = asyncio.create_task(sub.next_batch())
+            await asyncio.wait({batch_task, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if not batch_task.done():
+                batch_task.cancel()
+                break
+            batch = batch_task.result()
+            await websocket.send_json({"type": "batch", "events": batch})
+            if any(e.get("type") == "job" and e.get("state") in jobs.FINISHED_STATES for e in batch):
+                await websocket.close()
+                break
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        receiver.cancel()
+        sub.close()
+
+
+@app.post("/api/apify/webhook")
+async def apify_webhook(request: Request, secret: str = ""):
+    """Completion webhook for Instagram actor runs; wakes the job waiting for the run"""
+    if not hmac.compare_digest(secret, APIFY_WEBHOOK_SECRET):
+        raise HTTPException(status_code=403, detail="Invalid webhook secret")
+    try:
+        payload = await request.json()
+    except ValueError:
+        payload = None
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+    run_id = (payload.get("eventData") or {}).get("actorRunId") or (payload.get("resource") or {}).get("id")
+    if not run_id:
+        raise HTTPException(status_code=400, detail="Missing actor run id")
+    # Only the run id is trusted; the waiting job fetches the run's state from Apify itself
+    matched = apify_runs.notify_run_finished(str(run_id))
+    return {"success": True, "matched": matched}
 
 
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint"""
     apify_token = config_store.load_config("APIFY_TOKEN")
+    pool = tiktok_pool.get_shared_pool()
     return {
         "status": "healthy",
         "service": "kalshi-impressions-tool",
-        "apify_configured": bool(apify_token and apify_token.startswith("apify_api_"))
+        "apify_configured": bool(apify_token and apify_token.startswith("apify_api_")),
+        "tiktok_pool": pool.status() if pool else None,
+        "jobs": job_manager.status(),
+        "blocking_io": blocking_io.status(),
+        "auth_cache": firebase_service.token_cache_stats(),
+        "apify_runs": apify_runs.status(),
     }
 
 
@@ -2,16 +2,23 @@
 YouTube integration for fetching video statistics
 Uses YouTube Data API v3
 """
+import asyncio
 import os
 import re
 from urllib.parse import urlparse, parse_qs
-from typing import Optional, Tuple
+from typing import Dict, List, Optional, Tuple
+import httpx
 import requests
 
 # YouTube API configuration
 API_KEY = os.environ.get("YOUTUBE_API_KEY", "")
 API_BASE_URL = "https://www.googleapis.com/youtube/v3/videos"
 
+# videos.list accepts at most 50 comma-separated ids per call
+BATCH_SIZE = 50
+# Number of 50-id requests in flight at once
+MAX_CONCURRENT_BATCHES = int(os.getenv("YOUTUBE_MAX_CONCURRENT_BATCHES", "4"))
+
 # Regex patterns for extracting video IDs
 VIDEO_ID_PATTERNS = [
     re.compile(r'youtube\.com/watch\?v=([^&]+)'),
@@ -91,9 +98,13 @@ def canonicalize_youtube_url(url: str) -> Optional[str]:
     """
     video_id = extract_video_id(url)
     if video_id:
-        return f"https://www.youtube.com/watch?v={video_id}"
+        return canonical_url_for_id(video_id)
     return None
 
+def canonical_url_for_id(video_id: str) -> str:
+    """Build the canonical watch URL for a video ID."""
+    return f"https://www.youtube.com/watch?v={video_id}"
+
 def fetch_video_stats(video_id: str, api_key: Optional[str] = None) -> Tuple[str, str, str, str, str]:
     """
     Fetch statistics for a YouTube video.
@@ -154,6 +165,96 @@ def fetch_video_stats(video_id: str, api_key: Optional[str] = None) -> Tuple[str
     except Exception as e:
         return (video_id, "", "", "", f"error:{type(e).__name__}")
 
+async def _fetch_batch(client: httpx.AsyncClient, video_ids: List[str], api_key: str) -> Dict[str, Tuple[str, str, str, str, str]]:
+    """Fetch one videos.list page for up to BATCH_SIZE ids. Returns video_id -> stats tuple."""
+    def _all(status: str) -> Dict[str, Tuple[str, str, str, str, str]]:
+        return {vid: (vid, "", "", "", status) for vid in video_ids}
+
+    try:
+        params = {
+            "part": "statistics",
+            "id": ",".join(video_ids),
+            "maxResults": BATCH_SIZE,
+            "key": api_key
+        }
+        response = await client.get(API_BASE_URL, params=params)
+
+        # Handle quota exceeded
+        if response.status_code == 403:
+            if "quotaExceeded" in response.text:
+                return _all("quota_exceeded")
+
+        # Handle other errors
+        if response.status_code != 200:
+            return _all(f"http_error_{response.status_code}")
+
+        data = response.json()
+
+        # Ids missing from the response were deleted, made private or never existed
+        results = _all("not_found")
+        for item in data.get("items") or []:
+            vid = item.get("id")
+            if vid not in results:
+                continue
+            stats = item.get("statistics", {})
+            results[vid] = (
+                vid,
+                stats.get("viewCount", ""),
+                stats.get("likeCount", ""),
+                stats.get("commentCount", ""),
+                "ok",
+            )
+        return results
+
+    except httpx.TimeoutException:
+        return _all("timeout")
+    except httpx.HTTPError:
+        return _all("request_error")
+    except Exception as e:
+        return _all(f"error:{type(e).__name__}")
+
+async def fetch_videos_stats_batched(
+    video_ids: List[str],
+    api_key: Optional[str] = None,
+    max_concurrent: Optional[int] = None,
+) -> Dict[str, Tuple[str, str, str, str, str]]:
+    """
+    Fetch statistics for many YouTube videos, BATCH_SIZE ids per API call.
+    
+    Args:
+        video_ids: YouTube video IDs (duplicates are fetched once)
+        api_key: YouTube API key (uses env var if not provided)
+        max_concurrent: Batches in flight at once (default: MAX_CONCURRENT_BATCHES)
+        
+    Returns:
+        Dict of video_id -> (video_id, view_count, like_count, comment_count, status)
+        status is one of: "ok", "not_found", "quota_exceeded", "timeout", ...
+    """
+    unique_ids = list(dict.fromkeys(v for v in video_ids if v))
+    if not unique_ids:
+        return {}
+
+    if not api_key:
+        api_key = API_KEY
+
+    if not api_key:
+        return {vid: (vid, "", "", "", "no_api_key") for vid in unique_ids}
+
+    semaphore = asyncio.Semaphore(max(1, max_concurrent or MAX_CONCURRENT_BATCHES))
+    batches = [unique_ids[i:i + BATCH_SIZE] for i in range(0, len(unique_ids), BATCH_SIZE)]
+
+    async with httpx.AsyncClient(timeout=10) as client:
+        async def _bounded(batch: List[str]):
+            async with semaphore:
+                return await _fetch_batch(client, batch, api_key)
+
+        batch_results = await asyncio.gather(*(_bounded(b) for b in batches))
+
+    results: Dict[str, Tuple[str, str, str, str, str]] = {}
+    for batch_result in batch_results:
+        results.update(batch_result)
+    return results
+
 def fetch_stats_by_url(url: str, api_key: Optional[str] = None) -> Tuple[str, str, str, str, str]:
     """
     Fetch statistics for a YouTube video by URL.